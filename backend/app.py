@@ -1,29 +1,136 @@
+import argparse
+import bisect
 import dataclasses
+import itertools
 import json
+import math
 import os
 import re
-from multiprocessing import Pool
-from typing import Any, Dict, Generator, List, Literal, Optional, Tuple
+import sys
+import time
+from concurrent.futures import Future
+from functools import partial
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generator,
+    Iterable,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
-import bs4
 import dacite
+import numpy as np
 import requests
 import shortuuid
 
-from .data import URLS
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .cache import LRUCache
+from .catalog import (
+    DEFAULT_SORTS,
+    ORDER_CACHE_BYTES,
+    ORDER_CACHE_ENTRIES,
+    ColumnarCatalog,
+    SortKeys,
+    filter_signature,
+    sort_keys,
+)
+from .checkpoint import (
+    JOURNAL_FILE,
+    MANIFEST_FILE,
+    Checkpoint,
+    atomic_write,
+)
+from .cutlist import (
+    DEFAULT_KERF,
+    CutPlan,
+    PriceTable,
+    SizeKey,
+    optimize,
+    price_tables,
+)
+from .data import DATA_DIR, URLS
+from .fetch import (
+    DEFAULT_CONCURRENCY,
+    RETRY_STATUSES,
+    Fetcher,
+    ResponseError,
+    RetryPolicy,
+    check_response,
+)
+from .history import HISTORY_FILE, PriceHistory, PriceObservation
+from .httpcache import HTTPCache
+from .metrics import ROWS_RETURNED, ROWS_SCANNED, SORT_CACHE, STAGE_SECONDS
+from .parse import CHUNK_SIZE, DEFAULT_PARSER, get_parser
+from .snapshot import SNAPSHOT_FILE, read_snapshot, write_snapshot
+from .textindex import DIMENSION_COLUMNS, dimensions, text_match
 
 WEIGHT_RE = r'^\d*\.?\d*(?= lb$)'
-DATA_DIR = 'metalscrape'
+PRICE_URL = 'https://www.metalsdepot.com/system/modrequest'
+PRICE_RATE = 25.0
+BATCH_REJECTED = frozenset({400, 404, 405, 501})
+BATCH_UNSUPPORTED: Set[str] = set()
+
+
+class LengthSkuids(Mapping[str, str]):
+    __slots__ = ('lengths', 'skuids')
+
+    def __init__(self, length_skuids: Mapping[str, str]) -> None:
+        self.lengths = tuple(map(sys.intern, length_skuids))
+        self.skuids = tuple(length_skuids.values())
+
+    def __getitem__(self, length: str) -> str:
+        try:
+            return self.skuids[self.lengths.index(length)]
+        except ValueError:
+            raise KeyError(length) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.lengths)
+
+    def __len__(self) -> int:
+        return len(self.lengths)
+
+    def __contains__(self, length: object) -> bool:
+        return length in self.lengths
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, Mapping):
+            return dict(self) == dict(other)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
 
 
 @dataclasses.dataclass
 class ProductInfo:
+    __slots__ = (
+        'uuid',
+        'product_id',
+        'index',
+        'size',
+        'desc',
+        'length_skuids',
+        'base_weight',
+    )
     uuid: str
     product_id: str
     index: int
     size: str
     desc: str
-    length_skuids: Dict[str, str]
+    length_skuids: LengthSkuids
     base_weight: float
 
 
@@ -32,10 +139,34 @@ class ProductVariation:
     parent_uuid: str
     length: int
     price: float
+    skuid: Optional[str] = None
+    fetched_at: Optional[float] = None
+
+
+@dataclasses.dataclass
+class FailedLookup:
+    product_id: str
+    skuid: str
+    length: int
+    error: str
+    stale: bool = False
 
 
 @dataclasses.dataclass
 class SpecificProduct:
+    __slots__ = (
+        'product_id',
+        'index',
+        'material',
+        'shape',
+        'size',
+        'desc',
+        'base_weight',
+        'length',
+        'price',
+        'price_per_foot',
+        'price_per_pound',
+    )
     product_id: str
     index: int
     material: str
@@ -48,9 +179,16 @@ class SpecificProduct:
     price_per_foot: float
     price_per_pound: float
 
-    def __gt__(self, _: 'SpecificProduct') -> Literal[False]:
-        return False
 
+PRODUCT_CONFIG = dacite.Config(type_hooks={LengthSkuids: LengthSkuids})
+
+MaxAge = Union[float, Callable[[ProductInfo, str], float]]
+
+PendingVariation = Tuple[
+    ProductInfo,
+    str,
+    Union[ProductVariation, 'Future[Dict[str, ProductVariation]]'],
+]
 
 ProductBundles = Dict[
     Tuple[str, str], Tuple[List[ProductInfo], List[ProductVariation]]
@@ -61,50 +199,82 @@ class DataclassEncoder(json.JSONEncoder):
     def default(self, o: Any) -> Any:
         if dataclasses.is_dataclass(o):
             return dataclasses.asdict(o)
+        if isinstance(o, LengthSkuids):
+            return dict(o)
         return super().default(o)
 
 
-def scrape_products(url: str) -> Generator[ProductInfo, None, None]:
-    response = requests.get(url)
-    content = response.content
-    site = bs4.BeautifulSoup(content, 'html5lib')
-    products: List[bs4.element.Tag] = list(
-        site.find_all('div', attrs={'class': 'product-row'})
-    )
+def product_uuid(product_id: str) -> str:
+    return shortuuid.uuid(name=product_id)
 
-    for index, product in enumerate(products, 1):
-        info = tuple(
-            product.find('div', class_='product-size').stripped_strings
-        )
-        if len(info) != 2:
+
+def encode_json(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(
+        value, cls=DataclassEncoder, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def scrape_products(
+    url: str,
+    session: Optional[requests.Session] = None,
+    parser: str = DEFAULT_PARSER,
+) -> Generator[ProductInfo, None, None]:
+    response = (requests if session is None else session).get(url, stream=True)
+    with response:
+        check_response(response)
+        yield from parse_products(response.iter_content(CHUNK_SIZE), parser)
+
+
+def parse_products(
+    content: Union[bytes, Iterable[bytes]], parser: str = DEFAULT_PARSER
+) -> Generator[ProductInfo, None, None]:
+    chunks = [content] if isinstance(content, bytes) else content
+    for row in get_parser(parser)(chunks):
+        if len(row.size_strings) != 2 or row.product_id is None:
+            continue
+        size, desc = row.size_strings
+        if row.base_weight_text is None:
             continue
-        size, desc = info
-        base_weight_text = product.find(
-            'div', class_='product-base-weight'
-        ).text
-        base_weight_match = re.search(WEIGHT_RE, base_weight_text)
+        base_weight_match = re.search(WEIGHT_RE, row.base_weight_text)
         if base_weight_match is None:
             continue
         base_weight = float(base_weight_match.group())
-        product_id = product['data-product-id']
-        length_select = product.find('select', class_='length-select')
-        length_options: List[bs4.element.Tag] = list(
-            length_select.find_all('option')
+        length_skuids = LengthSkuids(
+            {
+                text.removesuffix(' Ft.'): skuid
+                for skuid, text in row.length_options
+                if skuid is not None and text.endswith(' Ft.')
+            }
         )
-        length_skuids = {
-            tag.text.removesuffix(' Ft.'): tag['data-skuid']
-            for tag in length_options
-            if tag.has_attr('data-skuid') and tag.text.endswith(' Ft.')
-        }
 
-        uuid = shortuuid.uuid()
+        uuid = product_uuid(row.product_id)
         yield ProductInfo(
-            uuid, product_id, index, size, desc, length_skuids, base_weight
+            uuid,
+            row.product_id,
+            row.index,
+            size,
+            desc,
+            length_skuids,
+            base_weight,
         )
 
 
+def scrape_product_list(
+    url: str,
+    session: Optional[requests.Session] = None,
+    parser: str = DEFAULT_PARSER,
+) -> List[ProductInfo]:
+    return list(scrape_products(url, session, parser))
+
+
 def get_product_variation(
-    product: ProductInfo, length: str, quantity: int = 1
+    product: ProductInfo,
+    length: str,
+    quantity: int = 1,
+    session: Optional[requests.Session] = None,
+    url: str = PRICE_URL,
 ) -> ProductVariation:
     if length not in product.length_skuids:
         raise ValueError(
@@ -116,46 +286,362 @@ def get_product_variation(
         'data[qty]': quantity,
         'data[sku_id]': product.length_skuids[length],
     }
-    url = 'https://www.metalsdepot.com/system/modrequest'
-    response = requests.post(url, payload)
-    if response.status_code != 200:
-        raise ValueError(
-            f'Response unsuccessful with status code {response.status_code}'
-        )
+    response = (requests if session is None else session).post(url, payload)
+    check_response(response)
     content = response.content.decode('ascii')
     price = float(content)
-    product_variation = ProductVariation(product.uuid, int(length), price)
+    product_variation = ProductVariation(
+        product.uuid,
+        int(length),
+        price,
+        product.length_skuids[length],
+        time.time(),
+    )
     return product_variation
 
 
+def get_product_variations(
+    product: ProductInfo,
+    lengths: Sequence[str],
+    quantity: int = 1,
+    session: Optional[requests.Session] = None,
+    url: str = PRICE_URL,
+    batch: bool = False,
+) -> Dict[str, ProductVariation]:
+    unknown = [
+        length for length in lengths if length not in product.length_skuids
+    ]
+    if unknown:
+        raise ValueError(
+            f'Lengths {unknown} not in valid lengths {product.length_skuids}'
+        )
+    if batch and url not in BATCH_UNSUPPORTED:
+        prices = get_batch_prices(product, lengths, quantity, session, url)
+        if prices is not None:
+            fetched_at = time.time()
+            return {
+                length: ProductVariation(
+                    product.uuid,
+                    int(length),
+                    prices[product.length_skuids[length]],
+                    product.length_skuids[length],
+                    fetched_at,
+                )
+                for length in lengths
+                if product.length_skuids[length] in prices
+            }
+        BATCH_UNSUPPORTED.add(url)
+
+    variations: Dict[str, ProductVariation] = {}
+    for length in lengths:
+        try:
+            variations[length] = get_product_variation(
+                product, length, quantity, session, url
+            )
+        except ResponseError as error:
+            if error.status_code in RETRY_STATUSES:
+                raise
+    return variations
+
+
+def get_batch_prices(
+    product: ProductInfo,
+    lengths: Sequence[str],
+    quantity: int,
+    session: Optional[requests.Session],
+    url: str,
+) -> Optional[Dict[str, float]]:
+    payload = {
+        'request': 'metals.getPrices',
+        'data[product_id]': product.product_id,
+        'data[qty]': quantity,
+        'data[sku_id][]': [
+            product.length_skuids[length] for length in lengths
+        ],
+    }
+    response = (requests if session is None else session).post(url, payload)
+    if response.status_code in BATCH_REJECTED:
+        return None
+    check_response(response)
+    try:
+        prices = response.json()
+    except ValueError:
+        return None
+    if (
+        not isinstance(prices, dict)
+        or not prices
+        or not set(prices) <= set(payload['data[sku_id][]'])
+    ):
+        return None
+    try:
+        prices = {skuid: float(price) for skuid, price in prices.items()}
+    except (TypeError, ValueError):
+        return None
+    if not all(map(math.isfinite, prices.values())):
+        return None
+    return prices
+
+
 def get_all_product_variations(
-    products: List[ProductInfo], limit: Optional[int] = None
-) -> List[ProductVariation]:
-    args_list = [
-        (product, length)
+    products: List[ProductInfo],
+    limit: Optional[int] = None,
+    fetcher: Optional[Fetcher] = None,
+    price_url: str = PRICE_URL,
+    batch: bool = False,
+) -> Tuple[List[ProductVariation], List[FailedLookup]]:
+    if fetcher is None:
+        with Fetcher(rate=PRICE_RATE) as fetcher:
+            return get_all_product_variations(
+                products, limit, fetcher, price_url, batch
+            )
+    plan: List[Tuple[ProductInfo, str, Optional[ProductVariation]]] = [
+        (product, length, None)
         for product in products
         for length in product.length_skuids
     ]
     if limit is not None:
-        args_list = args_list[:limit]
-    with Pool() as pool:
-        variations = pool.starmap(get_product_variation, args_list)
-    return variations
+        plan = plan[:limit]
+    get_prices = partial(get_product_variations, url=price_url, batch=batch)
+    pending = queue_variations(
+        fetcher,
+        get_prices,
+        plan,
+        batch and price_url not in BATCH_UNSUPPORTED,
+    )
+    return resolve_variations(pending)
+
+
+def write_bundle(
+    file_name: str,
+    path: str,
+    products: List[ProductInfo],
+    variations: Optional[List[ProductVariation]] = None,
+) -> None:
+    products_path = os.path.join(path, file_name + '.products.json')
+    with atomic_write(products_path) as file:
+        json.dump(products, file, cls=DataclassEncoder, indent=4)
+    if variations is not None:
+        variations_path = os.path.join(path, file_name + '.variations.json')
+        with atomic_write(variations_path) as file:
+            json.dump(variations, file, cls=DataclassEncoder, indent=4)
 
 
-def save(url: str, file_name: str, path: Optional[str] = None) -> None:
+def write_failures(
+    file_name: str, path: str, failures: List[FailedLookup]
+) -> None:
+    failures_path = os.path.join(path, file_name + '.failures.json')
+    if not failures:
+        if os.path.exists(failures_path):
+            os.remove(failures_path)
+        return
+    with atomic_write(failures_path) as file:
+        json.dump(failures, file, cls=DataclassEncoder, indent=4)
+
+
+def price_observations(
+    products: List[ProductInfo],
+    variations: List[ProductVariation],
+    material: str,
+    shape: str,
+) -> List[PriceObservation]:
+    products_dict = {product.uuid: product for product in products}
+    observations = []
+    for variation in variations:
+        product = products_dict.get(variation.parent_uuid)
+        if product is None or variation.fetched_at is None:
+            continue
+        skuid = variation.skuid or product.length_skuids.get(
+            str(variation.length)
+        )
+        if skuid is None:
+            continue
+        observations.append(
+            PriceObservation(
+                skuid,
+                product.uuid,
+                variation.length,
+                material,
+                shape,
+                product.size,
+                variation.price,
+                variation.fetched_at,
+            )
+        )
+    return observations
+
+
+def stored_variations(
+    file_name: str, path: str
+) -> Dict[str, ProductVariation]:
+    try:
+        products, variations = load(file_name, path)
+    except (FileNotFoundError, ValueError):
+        return {}
+    products_dict = {product.uuid: product for product in products}
+    stored: Dict[str, ProductVariation] = {}
+    for variation in variations:
+        skuid = variation.skuid
+        if skuid is None and variation.parent_uuid in products_dict:
+            product = products_dict[variation.parent_uuid]
+            skuid = product.length_skuids.get(str(variation.length))
+        if skuid is not None:
+            stored[skuid] = variation
+    return stored
+
+
+def plan_refresh(
+    products: List[ProductInfo],
+    stored: Dict[str, ProductVariation],
+    max_age: Optional[MaxAge],
+    now: Optional[float] = None,
+) -> List[Tuple[ProductInfo, str, Optional[ProductVariation]]]:
+    if now is None:
+        now = time.time()
+    plan: List[Tuple[ProductInfo, str, Optional[ProductVariation]]] = []
+    for product in products:
+        for length, skuid in product.length_skuids.items():
+            variation = stored.get(skuid)
+            if max_age is None or variation is None:
+                plan.append((product, length, None))
+                continue
+            limit = max_age(product, length) if callable(max_age) else max_age
+            if (
+                variation.fetched_at is None
+                or now - variation.fetched_at > limit
+            ):
+                plan.append((product, length, None))
+                continue
+            reused = dataclasses.replace(
+                variation,
+                parent_uuid=product.uuid,
+                length=int(length),
+                skuid=skuid,
+            )
+            plan.append((product, length, reused))
+    return plan
+
+
+def resolve_variations(
+    pending: List[PendingVariation],
+    stored: Optional[Dict[str, ProductVariation]] = None,
+) -> Tuple[List[ProductVariation], List[FailedLookup]]:
+    variations: List[ProductVariation] = []
+    failures: List[FailedLookup] = []
+    for product, length, entry in pending:
+        if isinstance(entry, ProductVariation):
+            variations.append(entry)
+            continue
+        skuid = product.length_skuids[length]
+        try:
+            variation = entry.result().get(length)
+            if variation is None:
+                raise ValueError(f'No price returned for SKU {skuid}')
+            variations.append(variation)
+        except Exception as error:
+            fallback = None if stored is None else stored.get(skuid)
+            failures.append(
+                FailedLookup(
+                    product.product_id,
+                    skuid,
+                    int(length),
+                    repr(error),
+                    fallback is not None,
+                )
+            )
+            if fallback is not None:
+                variations.append(
+                    dataclasses.replace(
+                        fallback,
+                        parent_uuid=product.uuid,
+                        length=int(length),
+                        skuid=skuid,
+                    )
+                )
+    return variations, failures
+
+
+def queue_variations(
+    fetcher: Fetcher,
+    get_prices: Callable[..., Dict[str, ProductVariation]],
+    plan: List[Tuple[ProductInfo, str, Optional[ProductVariation]]],
+    batch: bool = True,
+    callback: Optional[
+        Callable[['Future[Dict[str, ProductVariation]]'], None]
+    ] = None,
+) -> List[PendingVariation]:
+    futures: Dict[Tuple[str, str], 'Future[Dict[str, ProductVariation]]'] = {}
+    for product, group in itertools.groupby(
+        (entry for entry in plan if entry[2] is None),
+        key=lambda entry: entry[0],
+    ):
+        lengths = [length for _, length, _ in group]
+        for chunk in [lengths] if batch else [[length] for length in lengths]:
+            future = fetcher.submit(get_prices, product, chunk)
+            if callback is not None:
+                future.add_done_callback(callback)
+            futures.update(
+                ((product.uuid, length), future) for length in chunk
+            )
+    return [
+        (
+            product,
+            length,
+            futures[product.uuid, length] if reused is None else reused,
+        )
+        for product, length, reused in plan
+    ]
+
+
+def save(
+    url: str,
+    file_name: str,
+    path: Optional[str] = None,
+    fetcher: Optional[Fetcher] = None,
+    price_url: str = PRICE_URL,
+    max_age: Optional[MaxAge] = None,
+    parser: str = DEFAULT_PARSER,
+    batch: bool = False,
+) -> List[FailedLookup]:
+    if fetcher is None:
+        with Fetcher(rate=PRICE_RATE) as fetcher:
+            return save(
+                url,
+                file_name,
+                path,
+                fetcher,
+                price_url,
+                max_age,
+                parser,
+                batch,
+            )
     if path is None:
         path = os.path.join(os.path.expanduser('~'), DATA_DIR)
-    products_path = os.path.join(path, file_name + '.products.json')
-    variations_path = os.path.join(path, file_name + '.variations.json')
 
-    products: List[ProductInfo] = list(scrape_products(url))
-    with open(products_path, 'w') as file:
-        json.dump(products, file, cls=DataclassEncoder, indent=4)
+    stored = stored_variations(file_name, path)
+    products = scrape_product_list(url, fetcher.session, parser)
 
-    variations = get_all_product_variations(products)
-    with open(variations_path, 'w') as file:
-        json.dump(variations, file, cls=DataclassEncoder, indent=4)
+    get_prices = partial(get_product_variations, url=price_url, batch=batch)
+    pending = queue_variations(
+        fetcher,
+        get_prices,
+        plan_refresh(products, stored, max_age),
+        batch and price_url not in BATCH_UNSUPPORTED,
+    )
+    variations, failures = resolve_variations(pending, stored)
+    write_bundle(file_name, path, products, variations)
+    write_failures(file_name, path, failures)
+    compile_snapshot(path)
+    material, _, shape = file_name.partition('.')
+    with PriceHistory.open(path) as history:
+        history.record(
+            price_observations(
+                products,
+                variations,
+                unformat_file_name(material),
+                unformat_file_name(shape),
+            )
+        )
+    return failures
 
 
 def format_file_name(text: str) -> str:
@@ -167,12 +653,118 @@ def unformat_file_name(text: str) -> str:
 
 
 def save_all(
-    urls: Dict[Tuple[str, str], str], path: Optional[str] = None
+    urls: Dict[Tuple[str, str], str],
+    path: Optional[str] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    price_url: str = PRICE_URL,
+    max_age: Optional[MaxAge] = None,
+    parser: str = DEFAULT_PARSER,
+    rate: Optional[float] = PRICE_RATE,
+    retry: Optional[RetryPolicy] = None,
+    cache: Optional[HTTPCache] = None,
+    batch: bool = False,
+    resume: bool = False,
 ) -> None:
-    for index, ((material, shape), url) in enumerate(urls.items(), 1):
-        file_name = format_file_name(material) + '.' + format_file_name(shape)
-        save(url, file_name, path)
-        print(f'`Saved` {index} out of {len(urls)}: {material}, {shape}')
+    if path is None:
+        path = os.path.join(os.path.expanduser('~'), DATA_DIR)
+    os.makedirs(path, exist_ok=True)
+    file_names = {
+        key: format_file_name(key[0]) + '.' + format_file_name(key[1])
+        for key in urls
+    }
+    scrape = partial(scrape_product_list, parser=parser)
+    get_prices = partial(get_product_variations, url=price_url, batch=batch)
+    with Fetcher(
+        concurrency, rate, retry=retry, cache=cache
+    ) as fetcher, Checkpoint(
+        path,
+        {file_names[key]: url for key, url in urls.items()},
+        resume,
+    ) as checkpoint, PriceHistory.open(
+        path
+    ) as history:
+        journaled = {
+            entry['skuid']: dacite.from_dict(ProductVariation, entry)
+            for entry in checkpoint.journaled()
+        }
+        if checkpoint.resumed:
+            done = sum(map(checkpoint.complete, file_names.values()))
+            print(
+                f'Resuming: {done} of {len(urls)} pages complete, '
+                f'{len(journaled)} prices checkpointed'
+            )
+        product_futures = {
+            key: fetcher.submit(scrape, url)
+            for key, url in urls.items()
+            if not checkpoint.complete(file_names[key])
+        }
+        pages = []
+        for (material, shape), future in product_futures.items():
+            file_name = file_names[material, shape]
+            try:
+                products = future.result()
+            except Exception as error:
+                print(f'Skipping {material}, {shape}: {error!r}')
+                checkpoint.mark(file_name, 'failed')
+                continue
+            stored = stored_variations(file_name, path)
+            plan = [
+                (
+                    product,
+                    length,
+                    (
+                        journaled.get(product.length_skuids[length])
+                        if reused is None
+                        else reused
+                    ),
+                )
+                for product, length, reused in plan_refresh(
+                    products, stored, max_age
+                )
+            ]
+            pending = queue_variations(
+                fetcher,
+                get_prices,
+                plan,
+                batch and price_url not in BATCH_UNSUPPORTED,
+                checkpoint.record_future,
+            )
+            checkpoint.mark(file_name, 'scraped', products=len(products))
+            pages.append(
+                (material, shape, file_name, products, stored, pending)
+            )
+
+        for index, page in enumerate(pages, 1):
+            material, shape, file_name, products, stored, pending = page
+            variations, failures = resolve_variations(pending, stored)
+            write_bundle(file_name, path, products, variations)
+            write_failures(file_name, path, failures)
+            history.record(
+                price_observations(products, variations, material, shape)
+            )
+            fetched = sum(isinstance(entry, Future) for *_, entry in pending)
+            checkpoint.mark(
+                file_name,
+                'complete',
+                products=len(products),
+                fetched=fetched,
+                reused=len(pending) - fetched,
+                failed=len(failures),
+            )
+            print(
+                f'`Saved` {index} out of {len(pages)}: {material}, {shape} '
+                f'({fetched} fetched, {len(pending) - fetched} reused, '
+                f'{len(failures)} failed)'
+            )
+        if fetcher.retries:
+            print(f'Retried {fetcher.retries} requests')
+        if all(map(checkpoint.complete, file_names.values())):
+            checkpoint.finish()
+        else:
+            print('Some pages failed; run again with resume to retry them')
+    if cache is not None:
+        print(f'HTTP cache: {cache.stats()}')
+    compile_snapshot(path)
 
 
 def load(
@@ -193,7 +785,7 @@ def load(
     with open(products_path, 'r') as file:
         product_dicts = json.load(file)
         products = [
-            dacite.from_dict(ProductInfo, product_dict)
+            dacite.from_dict(ProductInfo, product_dict, PRODUCT_CONFIG)
             for product_dict in product_dicts
         ]
 
@@ -204,6 +796,15 @@ def load(
             for variation_dict in variation_dicts
         ]
 
+    uuids = {product.uuid for product in products}
+    orphans = sum(
+        variation.parent_uuid not in uuids for variation in variations
+    )
+    if orphans:
+        raise ValueError(
+            f'{orphans} variations in {variations_path} have no product in '
+            f'{products_path}'
+        )
     return products, variations
 
 
@@ -220,6 +821,13 @@ def load_all(
             print(f'Skipping path {file_path}: not a file.')
             continue
         if file_name.count('.') != 3:
+            if file_name in (
+                SNAPSHOT_FILE,
+                MANIFEST_FILE,
+                JOURNAL_FILE,
+                HISTORY_FILE,
+            ):
+                continue
             print(f'Skipping path {file_path}: improperly formatted file name')
             continue
         material, shape, data_type, ending = file_name.split('.')
@@ -229,12 +837,36 @@ def load_all(
         material = unformat_file_name(material)
         shape = unformat_file_name(shape)
         if data_type == 'products':
-            out[(material, shape)] = load(
-                file_name.removesuffix('.products.json'), path
-            )
+            try:
+                out[(material, shape)] = load(
+                    file_name.removesuffix('.products.json'), path
+                )
+            except (FileNotFoundError, ValueError) as error:
+                print(f'Skipping path {file_path}: {error}')
     return out
 
 
+def compile_snapshot(path: Optional[str] = None) -> str:
+    if path is None:
+        path = os.path.join(os.path.expanduser('~'), DATA_DIR)
+    specific_products = get_all_specific_products(load_all(path))
+    snapshot_path = os.path.join(path, SNAPSHOT_FILE)
+    write_snapshot(ColumnarCatalog.from_rows(specific_products), snapshot_path)
+    return snapshot_path
+
+
+def current_snapshot(path: str) -> str:
+    snapshot_path = os.path.join(path, SNAPSHOT_FILE)
+    snapshot_mtime = os.stat(snapshot_path).st_mtime_ns
+    for entry in os.scandir(path):
+        if (
+            entry.name.endswith(('.products.json', '.variations.json'))
+            and entry.stat().st_mtime_ns > snapshot_mtime
+        ):
+            raise ValueError(f'Snapshot is older than {entry.name}')
+    return snapshot_path
+
+
 def stitch_specific_product(
     product: ProductInfo,
     variation: ProductVariation,
@@ -248,10 +880,10 @@ def stitch_specific_product(
     specific = SpecificProduct(
         product.uuid,
         product.index,
-        material,
-        shape,
-        product.size,
-        product.desc,
+        sys.intern(material),
+        sys.intern(shape),
+        sys.intern(product.size),
+        sys.intern(product.desc),
         product.base_weight,
         variation.length,
         variation.price,
@@ -288,116 +920,602 @@ def get_all_specific_products(
     return specific_products
 
 
+class CatalogRows(Sequence[SpecificProduct]):
+    def __init__(self, catalog: ColumnarCatalog) -> None:
+        self.catalog = catalog
+
+    def __len__(self) -> int:
+        return self.catalog.size
+
+    def __getitem__(self, index: Any) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('Catalog row index out of range')
+        return SpecificProduct(**self.catalog.row(index))
+
+
+@dataclasses.dataclass
+class Page:
+    items: List[SpecificProduct]
+    total: int
+    next_cursor: Optional[int]
+
+
+def legacy_filter_func(
+    materials: Optional[List[str]],
+    shapes: Optional[List[str]],
+    filters: Dict[str, str],
+) -> Callable[[SpecificProduct], bool]:
+    def filter_func(specific_product: SpecificProduct) -> bool:
+        return not (
+            (
+                materials is not None
+                and specific_product.material not in materials
+            )
+            or (shapes is not None and specific_product.shape not in shapes)
+            or (
+                filters['lengthLower'] is not None
+                and specific_product.length < float(filters['lengthLower'])
+            )
+            or (
+                filters['lengthUpper'] is not None
+                and specific_product.length > float(filters['lengthUpper'])
+            )
+            or (
+                filters['poundsPerFootLower'] is not None
+                and specific_product.base_weight
+                < float(filters['poundsPerFootLower'])
+            )
+            or (
+                filters['poundsPerFootUpper'] is not None
+                and specific_product.base_weight
+                > float(filters['poundsPerFootUpper'])
+            )
+            or (
+                filters['priceLower'] is not None
+                and specific_product.price < float(filters['priceLower'])
+            )
+            or (
+                filters['priceUpper'] is not None
+                and specific_product.price > float(filters['priceUpper'])
+            )
+            or (
+                filters['pricePerFootLower'] is not None
+                and specific_product.price_per_foot
+                < float(filters['pricePerFootLower'])
+            )
+            or (
+                filters['pricePerFootUpper'] is not None
+                and specific_product.price_per_foot
+                > float(filters['pricePerFootUpper'])
+            )
+            or (
+                filters['pricePerPoundLower'] is not None
+                and specific_product.price_per_pound
+                < float(filters['pricePerPoundLower'])
+            )
+            or (
+                filters['pricePerPoundUpper'] is not None
+                and specific_product.price_per_pound
+                > float(filters['pricePerPoundUpper'])
+            )
+            or any(
+                (
+                    filters.get(column + 'Lower') is not None
+                    and not value >= float(filters[column + 'Lower'])
+                )
+                or (
+                    filters.get(column + 'Upper') is not None
+                    and not value <= float(filters[column + 'Upper'])
+                )
+                for column, value in zip(
+                    DIMENSION_COLUMNS,
+                    dimensions(
+                        specific_product.shape,
+                        specific_product.size,
+                        specific_product.desc,
+                    ),
+                )
+            )
+            or (
+                filters.get('q')
+                and not text_match(
+                    filters['q'], specific_product.size, specific_product.desc
+                )
+            )
+        )
+
+    return filter_func
+
+
+def parse_filters(
+    args: Mapping[str, str],
+) -> Tuple[Optional[List[str]], Optional[List[str]], Dict[str, Optional[str]]]:
+    filters = {
+        'lengthLower': args.get('lengthLower', None),
+        'lengthUpper': args.get('lengthUpper', None),
+        'poundsPerFootLower': args.get('poundsPerFootLower', None),
+        'poundsPerFootUpper': args.get('poundsPerFootUpper', None),
+        'priceLower': args.get('priceLower', None),
+        'priceUpper': args.get('priceUpper', None),
+        'pricePerFootLower': args.get('pricePerFootLower', None),
+        'pricePerFootUpper': args.get('pricePerFootUpper', None),
+        'pricePerPoundLower': args.get('pricePerPoundLower', None),
+        'pricePerPoundUpper': args.get('pricePerPoundUpper', None),
+        'thicknessLower': args.get('thicknessLower', None),
+        'thicknessUpper': args.get('thicknessUpper', None),
+        'widthLower': args.get('widthLower', None),
+        'widthUpper': args.get('widthUpper', None),
+        'odLower': args.get('odLower', None),
+        'odUpper': args.get('odUpper', None),
+        'q': args.get('q', None),
+    }
+
+    filter_materials_string = args.get('materials')
+    if filter_materials_string is not None:
+        filter_materials = filter_materials_string.split(',')
+    else:
+        filter_materials = None
+    filter_shapes_string = args.get('shapes')
+    if filter_shapes_string is not None:
+        filter_shapes = filter_shapes_string.split(',')
+    else:
+        filter_shapes = None
+    return filter_materials, filter_shapes, filters
+
+
 class SpecificProducts:
     def __init__(
-        self, product_bundles: ProductBundles
-    ) -> List[SpecificProduct]:
-        self.specific_products = get_all_specific_products(product_bundles)
-        self.sort_cache = {}
+        self,
+        product_bundles: ProductBundles,
+        columnar: bool = True,
+        cache_entries: int = 128,
+        cache_bytes: int = 64 * 2**20,
+    ) -> None:
+        self.columnar = columnar
+        self.sort_cache: Dict[Tuple[SortKeys, bool], List[int]] = {}
+        self.order_cache = LRUCache(ORDER_CACHE_ENTRIES, ORDER_CACHE_BYTES)
+        self.result_cache = LRUCache(cache_entries, cache_bytes)
+        self.reload(product_bundles)
 
-    def search(
+    @classmethod
+    def from_catalog(
+        cls, catalog: ColumnarCatalog, **kwargs: Any
+    ) -> 'SpecificProducts':
+        specific_products = cls({}, **kwargs)
+        specific_products.swap(CatalogRows(catalog), catalog)
+        return specific_products
+
+    @classmethod
+    def from_snapshot(
+        cls, file_path: Optional[str] = None, **kwargs: Any
+    ) -> 'SpecificProducts':
+        if file_path is None:
+            file_path = os.path.join(
+                os.path.expanduser('~'), DATA_DIR, SNAPSHOT_FILE
+            )
+        return cls.from_catalog(read_snapshot(file_path), **kwargs)
+
+    def reload(self, product_bundles: ProductBundles) -> None:
+        specific_products = get_all_specific_products(product_bundles)
+        if not self.columnar:
+            self.swap(specific_products, None)
+            return
+        catalog = ColumnarCatalog.from_rows(specific_products)
+        self.swap(CatalogRows(catalog), catalog)
+
+    def swap(
+        self,
+        specific_products: Sequence[SpecificProduct],
+        catalog: Optional[ColumnarCatalog],
+    ) -> None:
+        self.specific_products = specific_products
+        self.catalog = catalog
+        self.row_json_cache: List[Optional[bytes]] = [None] * len(
+            specific_products
+        )
+        self.sort_cache.clear()
+        self.order_cache.clear()
+        self.result_cache.clear()
+        self.price_tables: Optional[Dict[SizeKey, PriceTable]] = None
+
+    def warm(self) -> None:
+        if self.catalog is not None:
+            self.catalog.warm()
+            return
+        for attribute in SpecificProduct.__dataclass_fields__:
+            for ascending in (True, False):
+                self.sorted_indices(attribute, ascending)
+
+    def cached_indices(
+        self, keys: SortKeys, reverse: bool
+    ) -> Optional[List[int]]:
+        if keys in DEFAULT_SORTS:
+            return self.sort_cache.get((keys, reverse))
+        return self.order_cache.get((keys, reverse))
+
+    def sorted_indices(self, attribute: str, ascending: bool) -> Sequence[int]:
+        if self.catalog is not None:
+            cached = self.catalog.sorted(attribute, ascending)
+            SORT_CACHE.inc(result='hit' if cached else 'miss')
+            return self.catalog.sort_order(attribute, ascending)
+        keys, reverse = sort_keys(attribute, ascending)
+        indices = self.cached_indices(keys, reverse)
+        SORT_CACHE.inc(result='miss' if indices is None else 'hit')
+        if indices is not None:
+            return indices
+
+        reversed_indices = self.cached_indices(keys, not reverse)
+        if reversed_indices is not None:
+            indices = reversed_indices[::-1]
+        else:
+            indices = list(range(len(self.specific_products)))
+            for column, order in reversed(keys):
+                values = [
+                    getattr(specific_product, column)
+                    for specific_product in self.specific_products
+                ]
+                indices.sort(key=values.__getitem__, reverse=not order)
+            if reverse:
+                indices.reverse()
+        if keys in DEFAULT_SORTS:
+            self.sort_cache[(keys, reverse)] = indices
+        else:
+            self.order_cache.put((keys, reverse), indices)
+        return indices
+
+    def matches(
         self,
         attribute: str,
         ascending: bool,
         materials: Optional[List[str]],
         shapes: Optional[List[str]],
         filters: Dict[str, str],
-        batch_index: int = 0,
-        batch_limit: int = 20,
-    ) -> List[SpecificProduct]:
-        if (attribute, ascending) in self.sort_cache:
-            indices = self.sort_cache[(attribute, ascending)]
-            sorted_specific_products = [
-                self.specific_products[index] for index in indices
-            ]
-        else:
-            order = ['index', 'length', 'price', 'base_weight']
-            if attribute in order:
-                order.remove(attribute)
-            order.insert(0, attribute)
-            decorated: List[
-                Tuple[Any, Any, Any, Any, SpecificProduct, int]
-            ] = [
-                tuple(getattr(specific_product, attr) for attr in order)
-                + (specific_product, index)
-                for index, specific_product in enumerate(
-                    self.specific_products
-                )
-            ]
-            decorated.sort(reverse=not ascending)
-            sorted_specific_products = [entry[-2] for entry in decorated]
-            indices = [entry[-1] for entry in decorated]
-            self.sort_cache[(attribute, ascending)] = indices
+        cursor: int = 0,
+    ) -> Iterator[Tuple[int, int]]:
+        indices = self.sorted_indices(attribute, ascending)
+        if self.catalog is not None:
+            return self.catalog.stream(
+                indices, materials, shapes, filters, cursor
+            )
+        filter_func = legacy_filter_func(materials, shapes, filters)
+        return (
+            (position, indices[position])
+            for position in range(cursor, len(indices))
+            if filter_func(self.specific_products[indices[position]])
+        )
 
-        def filter_func(specific_product: SpecificProduct) -> bool:
-            return not (
-                (
-                    materials is not None
-                    and specific_product.material not in materials
-                )
-                or (
-                    shapes is not None and specific_product.shape not in shapes
-                )
-                or (
-                    filters['lengthLower'] is not None
-                    and specific_product.length < float(filters['lengthLower'])
-                )
-                or (
-                    filters['lengthUpper'] is not None
-                    and specific_product.length > float(filters['lengthUpper'])
-                )
-                or (
-                    filters['poundsPerFootLower'] is not None
-                    and specific_product.base_weight
-                    < float(filters['poundsPerFootLower'])
-                )
-                or (
-                    filters['poundsPerFootUpper'] is not None
-                    and specific_product.base_weight
-                    > float(filters['poundsPerFootUpper'])
-                )
-                or (
-                    filters['priceLower'] is not None
-                    and specific_product.price < float(filters['priceLower'])
-                )
-                or (
-                    filters['priceUpper'] is not None
-                    and specific_product.price > float(filters['priceUpper'])
-                )
-                or (
-                    filters['pricePerFootLower'] is not None
-                    and specific_product.price_per_foot
-                    < float(filters['pricePerFootLower'])
-                )
-                or (
-                    filters['pricePerFootUpper'] is not None
-                    and specific_product.price_per_foot
-                    > float(filters['pricePerFootUpper'])
+    def count(
+        self,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, str],
+    ) -> int:
+        key = ('count', filter_signature(materials, shapes, filters))
+        total = self.result_cache.get(key)
+        if total is None:
+            if self.catalog is not None:
+                total = self.catalog.count(materials, shapes, filters)
+            else:
+                filter_func = legacy_filter_func(materials, shapes, filters)
+                total = sum(map(filter_func, self.specific_products))
+                ROWS_SCANNED.inc(len(self.specific_products))
+            self.result_cache.put(key, total)
+        return total
+
+    def facets(
+        self,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, str],
+    ) -> Dict[str, Any]:
+        if self.catalog is None:
+            raise ValueError('Facets require the columnar catalog')
+        key = ('facets', filter_signature(materials, shapes, filters))
+        facets = self.result_cache.get(key)
+        if facets is None:
+            facets = self.catalog.facets(materials, shapes, filters)
+            self.result_cache.put(key, facets)
+        return facets
+
+    def top(
+        self,
+        attribute: str,
+        ascending: bool,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, str],
+        count: int,
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        assert self.catalog is not None
+        key = (
+            'top',
+            attribute,
+            ascending,
+            filter_signature(materials, shapes, filters),
+        )
+        top = self.result_cache.get(key)
+        if top is None or len(top[0]) < count:
+            top = self.catalog.top(
+                attribute, ascending, materials, shapes, filters, count
+            )
+            if top is not None:
+                self.result_cache.put(key, top)
+        return top
+
+    def filtered_positions(
+        self,
+        attribute: str,
+        ascending: bool,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, str],
+    ) -> Sequence[int]:
+        key = (
+            attribute,
+            ascending,
+            filter_signature(materials, shapes, filters),
+        )
+        positions = self.result_cache.get(key)
+        if positions is None:
+            if self.catalog is not None:
+                positions = self.catalog.positions(
+                    attribute, ascending, materials, shapes, filters
                 )
-                or (
-                    filters['pricePerPoundLower'] is not None
-                    and specific_product.price_per_pound
-                    < float(filters['pricePerPoundLower'])
+            else:
+                ROWS_SCANNED.inc(len(self.specific_products))
+                positions = [
+                    position
+                    for position, _ in self.matches(
+                        attribute, ascending, materials, shapes, filters
+                    )
+                ]
+            self.result_cache.put(key, positions)
+        return positions
+
+    def window(
+        self,
+        attribute: str,
+        ascending: bool,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, str],
+        cursor: int = 0,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> Tuple[List[int], int, Optional[int]]:
+        top = None
+        if (
+            self.catalog is not None
+            and cursor == 0
+            and not self.catalog.sorted(attribute, ascending)
+            and (
+                attribute,
+                ascending,
+                filter_signature(materials, shapes, filters),
+            )
+            not in self.result_cache
+        ):
+            with STAGE_SECONDS.time(stage='top'):
+                top = self.top(
+                    attribute,
+                    ascending,
+                    materials,
+                    shapes,
+                    filters,
+                    offset + limit + 1,
                 )
-                or (
-                    filters['pricePerPoundUpper'] is not None
-                    and specific_product.price_per_pound
-                    > float(filters['pricePerPoundUpper'])
+        if top is not None:
+            positions, indices = top
+            stop = offset + limit + 1
+            window = list(
+                zip(
+                    positions[offset:stop].tolist(),
+                    indices[offset:stop].tolist(),
                 )
             )
+            with STAGE_SECONDS.time(stage='count'):
+                total = self.count(materials, shapes, filters)
+        else:
+            with STAGE_SECONDS.time(stage='sort'):
+                indices = self.sorted_indices(attribute, ascending)
+            if self.result_cache.max_entries > 0:
+                with STAGE_SECONDS.time(stage='filter'):
+                    positions = self.filtered_positions(
+                        attribute, ascending, materials, shapes, filters
+                    )
+                with STAGE_SECONDS.time(stage='slice'):
+                    start = bisect.bisect_left(positions, cursor) + offset
+                    window = [
+                        (int(position), int(indices[position]))
+                        for position in positions[start : start + limit + 1]
+                    ]
+                total = len(positions)
+            else:
+                with STAGE_SECONDS.time(stage='filter'):
+                    matches = self.matches(
+                        attribute,
+                        ascending,
+                        materials,
+                        shapes,
+                        filters,
+                        cursor,
+                    )
+                    window = list(
+                        itertools.islice(matches, offset, offset + limit + 1)
+                    )
+                    if self.catalog is None:
+                        ROWS_SCANNED.inc(
+                            (window[-1][0] + 1 if window else len(indices))
+                            - cursor
+                        )
+                with STAGE_SECONDS.time(stage='count'):
+                    total = self.count(materials, shapes, filters)
+        rows = [index for _, index in window[:limit]]
+        next_cursor = window[limit][0] if len(window) > limit else None
+        ROWS_RETURNED.inc(len(rows))
+        return rows, total, next_cursor
 
-        filtered_specific_products = list(
-            filter(filter_func, sorted_specific_products)
+    def page(
+        self,
+        attribute: str,
+        ascending: bool,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, str],
+        cursor: int = 0,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> Page:
+        rows, total, next_cursor = self.window(
+            attribute,
+            ascending,
+            materials,
+            shapes,
+            filters,
+            cursor,
+            offset,
+            limit,
         )
-        return filtered_specific_products[
-            batch_index * batch_limit : (batch_index + 1) * batch_limit
-        ]
+        items = [self.specific_products[index] for index in rows]
+        return Page(items, total, next_cursor)
+
+    def row_json(self, index: int) -> bytes:
+        fragment = self.row_json_cache[index]
+        if fragment is None:
+            fragment = encode_json(self.specific_products[index])
+            self.row_json_cache[index] = fragment
+        return fragment
+
+    def page_json(
+        self,
+        attribute: str,
+        ascending: bool,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, str],
+        cursor: int = 0,
+        offset: int = 0,
+        limit: int = 20,
+    ) -> bytes:
+        rows, total, next_cursor = self.window(
+            attribute,
+            ascending,
+            materials,
+            shapes,
+            filters,
+            cursor,
+            offset,
+            limit,
+        )
+        with STAGE_SECONDS.time(stage='encode'):
+            items = b','.join(self.row_json(index) for index in rows)
+        return b'{"items":[%s],"total":%d,"next_cursor":%s}' % (
+            items,
+            total,
+            b'null' if next_cursor is None else b'%d' % next_cursor,
+        )
+
+    def search(
+        self,
+        attribute: str,
+        ascending: bool,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, str],
+        batch_index: int = 0,
+        batch_limit: int = 20,
+    ) -> List[SpecificProduct]:
+        page = self.page(
+            attribute,
+            ascending,
+            materials,
+            shapes,
+            filters,
+            offset=batch_index * batch_limit,
+            limit=batch_limit,
+        )
+        return page.items
+
+    def optimize(
+        self,
+        material: str,
+        shape: str,
+        size: str,
+        pieces: List[float],
+        kerf: float = DEFAULT_KERF,
+    ) -> CutPlan:
+        if self.price_tables is None:
+            catalog = self.catalog
+            if catalog is None:
+                catalog = ColumnarCatalog.from_rows(self.specific_products)
+            self.price_tables = price_tables(catalog)
+        return optimize(self.price_tables, material, shape, size, pieces, kerf)
+
+
+def load_catalog(path: Optional[str] = None) -> SpecificProducts:
+    if path is None:
+        path = os.path.join(os.path.expanduser('~'), DATA_DIR)
+    try:
+        specific_products = SpecificProducts.from_snapshot(
+            current_snapshot(path)
+        )
+    except (FileNotFoundError, ValueError) as error:
+        print(f'Loading JSON catalog: {error}')
+        product_bundles = load_all(path)
+        specific_products = SpecificProducts(product_bundles)
+    specific_products.warm()
+    return specific_products
 
 
 def main() -> None:
-    save_all(URLS)
-    product_bundles = load_all()
-    SpecificProducts(product_bundles)
+    parser = argparse.ArgumentParser(description='Scrape the catalog.')
+    parser.add_argument(
+        '--cache', action='store_true', help='cache HTTP responses on disk'
+    )
+    parser.add_argument('--cache-dir', default=None)
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='replay responses from the HTTP cache without network access',
+    )
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='continue an interrupted scrape from its checkpoint',
+    )
+    parser.add_argument(
+        '--batch-prices',
+        action='store_true',
+        help='request all lengths of a product in one metals.getPrices call',
+    )
+    parser.add_argument(
+        '--max-age',
+        type=float,
+        default=None,
+        metavar='SECONDS',
+        help='reuse stored prices fetched within this many seconds',
+    )
+    args = parser.parse_args()
+    if args.max_age is not None and args.max_age < 0:
+        parser.error('--max-age must not be negative')
+
+    cache = (
+        HTTPCache(args.cache_dir, offline=args.offline)
+        if args.cache or args.offline
+        else None
+    )
+    save_all(
+        URLS,
+        cache=cache,
+        max_age=args.max_age,
+        batch=args.batch_prices,
+        resume=args.resume,
+    )
+    SpecificProducts.from_snapshot()
 
 
 if __name__ == '__main__':
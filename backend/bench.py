@@ -0,0 +1,427 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .app import (
+    DataclassEncoder,
+    LengthSkuids,
+    ProductBundles,
+    ProductInfo,
+    ProductVariation,
+    SpecificProducts,
+    compile_snapshot,
+    format_file_name,
+    get_all_specific_products,
+    load_all,
+    parse_products,
+    product_uuid,
+    write_bundle,
+)
+from .catalog import FILTER_COLUMNS
+from .data import URLS
+from .parse import available_parsers
+from .snapshot import read_snapshot
+from .stub import render_page
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+LENGTHS = ['2', '4', '5', '6', '8', '10', '12', '20', '24']
+FRACTIONS = [
+    '1/8',
+    '3/16',
+    '1/4',
+    '5/16',
+    '3/8',
+    '1/2',
+    '5/8',
+    '3/4',
+    '1',
+    '1-1/4',
+    '1-1/2',
+    '2',
+    '3',
+    '4',
+    '6',
+]
+GRADES = ['A36 Hot Rolled', 'A500 Welded', '6061-T6', '304 #4 Finish']
+PARSE_PRODUCTS = 500
+LEGACY_MAX_ROWS = 100_000
+
+Query = Dict[str, Any]
+
+
+def empty_filters() -> Dict[str, Optional[str]]:
+    return {
+        key + bound: None
+        for key in FILTER_COLUMNS
+        for bound in ('Lower', 'Upper')
+    }
+
+
+def query(
+    attribute: str,
+    ascending: bool = True,
+    materials: Optional[List[str]] = None,
+    shapes: Optional[List[str]] = None,
+    batch_index: int = 0,
+    **bounds: str,
+) -> Query:
+    filters = empty_filters()
+    filters.update(bounds)
+    return {
+        'attribute': attribute,
+        'ascending': ascending,
+        'materials': materials,
+        'shapes': shapes,
+        'filters': filters,
+        'batch_index': batch_index,
+    }
+
+
+QUERIES = {
+    'index_first_page': query('index'),
+    'price_one_material': query('price', materials=['Steel']),
+    'narrow_price_per_pound': query(
+        'price_per_pound', pricePerPoundLower='2.0', pricePerPoundUpper='2.1'
+    ),
+    'bounded_materials_shapes': query(
+        'price_per_foot',
+        False,
+        ['Aluminum 6061', 'Stainless 304'],
+        ['Round Bar', 'Flat Bar'],
+        lengthLower='8',
+        priceUpper='200',
+    ),
+    'size_descending_deep_page': query('size', False, batch_index=100),
+}
+
+
+def synthetic_bundles(
+    rows: int, lengths_per_product: int = 4, seed: int = 0
+) -> ProductBundles:
+    rng = random.Random(seed)
+    keys = list(URLS)
+    bundles: ProductBundles = {key: ([], []) for key in keys}
+    remaining = rows
+    number = 0
+    while remaining > 0:
+        products, variations = bundles[keys[number % len(keys)]]
+        product_id = str(100_000 + number)
+        lengths = sorted(rng.sample(LENGTHS, lengths_per_product), key=int)
+        lengths = lengths[:remaining]
+        product = ProductInfo(
+            product_uuid(product_id),
+            product_id,
+            len(products) + 1,
+            f'{rng.choice(FRACTIONS)}" x {rng.choice(FRACTIONS)}"',
+            f'{rng.choice(FRACTIONS)}" wall {rng.choice(GRADES)}',
+            LengthSkuids(
+                {length: f'{product_id}-{length}' for length in lengths}
+            ),
+            round(rng.uniform(0.05, 40.0), 3),
+        )
+        products.append(product)
+        rate = rng.uniform(0.8, 6.0)
+        for length in lengths:
+            price = round(product.base_weight * int(length) * rate, 2)
+            variations.append(
+                ProductVariation(
+                    product.uuid,
+                    int(length),
+                    price,
+                    product.length_skuids[length],
+                    time.time(),
+                )
+            )
+        remaining -= len(lengths)
+        number += 1
+    return {key: bundle for key, bundle in bundles.items() if bundle[0]}
+
+
+def measure(func: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {
+        'min': min(times),
+        'median': statistics.median(times),
+        'mean': statistics.fmean(times),
+        'repeat': repeat,
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        output = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'],
+            capture_output=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            text=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+class Recorder:
+    def __init__(self, repeat: int) -> None:
+        self.repeat = repeat
+        self.results: List[Dict[str, Any]] = []
+
+    def run(
+        self,
+        benchmark: str,
+        func: Callable[[], Any],
+        repeat: Optional[int] = None,
+        **labels: Any,
+    ) -> None:
+        result = {'benchmark': benchmark, **labels}
+        result.update(measure(func, self.repeat if repeat is None else repeat))
+        self.results.append(result)
+        described = ' '.join(f'{key}={value}' for key, value in labels.items())
+        print(
+            f'{benchmark} {described}: {result["median"] * 1e3:.3f} ms',
+            file=sys.stderr,
+        )
+
+    def memory(
+        self, benchmark: str, func: Callable[[], Any], rows: int, **labels: Any
+    ) -> None:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            start = tracemalloc.get_traced_memory()[0]
+            retained = func()
+            gc.collect()
+            size = tracemalloc.get_traced_memory()[0] - start
+        finally:
+            tracemalloc.stop()
+        del retained
+        result = {
+            'benchmark': benchmark,
+            'rows': rows,
+            **labels,
+            'bytes': size,
+            'bytes_per_row': size / rows,
+        }
+        self.results.append(result)
+        described = ' '.join(f'{key}={value}' for key, value in labels.items())
+        print(
+            f'{benchmark} rows={rows} {described}: '
+            f'{size / rows:.1f} bytes per row',
+            file=sys.stderr,
+        )
+
+
+def bench_search(
+    recorder: Recorder,
+    specific_products: SpecificProducts,
+    engine: str,
+    rows: int,
+) -> None:
+    for case, params in QUERIES.items():
+        args = (
+            params['attribute'],
+            params['ascending'],
+            params['materials'],
+            params['shapes'],
+            params['filters'],
+        )
+
+        def cold() -> None:
+            specific_products.result_cache.clear()
+            specific_products.search(*args, params['batch_index'])
+
+        def warm() -> None:
+            specific_products.search(*args, params['batch_index'])
+
+        recorder.run(
+            'search', cold, rows=rows, engine=engine, case=case, cache='cold'
+        )
+        recorder.run(
+            'search', warm, rows=rows, engine=engine, case=case, cache='warm'
+        )
+
+
+def bench_encoding(
+    recorder: Recorder, specific_products: SpecificProducts, rows: int
+) -> None:
+    params = QUERIES['price_one_material']
+    args = (
+        params['attribute'],
+        params['ascending'],
+        params['materials'],
+        params['shapes'],
+        params['filters'],
+    )
+    page = specific_products.page(*args)
+    recorder.run(
+        'encode',
+        lambda: json.dumps(page, cls=DataclassEncoder),
+        rows=rows,
+        case='dataclass_encoder',
+    )
+    specific_products.page_json(*args)
+    recorder.run(
+        'encode',
+        lambda: specific_products.page_json(*args),
+        rows=rows,
+        case='row_fragments',
+    )
+
+
+def bench_size(
+    recorder: Recorder, rows: int, legacy_max_rows: int, load_repeat: int
+) -> None:
+    print(f'Generating {rows} rows', file=sys.stderr)
+    bundles = synthetic_bundles(rows)
+
+    with tempfile.TemporaryDirectory() as path:
+        for (material, shape), (products, variations) in bundles.items():
+            file_name = (
+                format_file_name(material) + '.' + format_file_name(shape)
+            )
+            write_bundle(file_name, path, products, variations)
+        recorder.run(
+            'load_all', lambda: load_all(path), load_repeat, rows=rows
+        )
+        recorder.memory(
+            'memory', lambda: load_all(path), rows, model='bundles'
+        )
+        snapshot_path = compile_snapshot(path)
+        recorder.run(
+            'read_snapshot', lambda: read_snapshot(snapshot_path), rows=rows
+        )
+        recorder.memory(
+            'memory',
+            lambda: SpecificProducts.from_snapshot(snapshot_path),
+            rows,
+            model='snapshot',
+        )
+
+    recorder.run(
+        'get_all_specific_products',
+        lambda: get_all_specific_products(bundles),
+        load_repeat,
+        rows=rows,
+    )
+    recorder.run(
+        'build_catalog',
+        lambda: SpecificProducts(bundles),
+        load_repeat,
+        rows=rows,
+    )
+    recorder.memory(
+        'memory',
+        lambda: get_all_specific_products(bundles),
+        rows,
+        model='rows',
+    )
+    recorder.memory(
+        'memory', lambda: SpecificProducts(bundles), rows, model='columnar'
+    )
+
+    specific_products = SpecificProducts(bundles)
+    recorder.run(
+        'warm', specific_products.warm, 1, rows=rows, engine='columnar'
+    )
+    bench_search(recorder, specific_products, 'columnar', rows)
+    bench_encoding(recorder, specific_products, rows)
+    recorder.run(
+        'facets',
+        lambda: specific_products.catalog.facets(
+            ['Steel'], None, empty_filters()
+        ),
+        rows=rows,
+    )
+    if rows <= legacy_max_rows:
+        legacy = SpecificProducts(bundles, columnar=False)
+        legacy.warm()
+        bench_search(recorder, legacy, 'legacy', rows)
+
+
+def bench_parse(
+    recorder: Recorder, html_paths: List[str], products: int
+) -> None:
+    fixtures: Dict[str, bytes] = {}
+    bundles = synthetic_bundles(products * 4)
+    page_products = [
+        product
+        for bundle_products, _ in bundles.values()
+        for product in bundle_products
+    ]
+    fixtures['synthetic'] = render_page(page_products).encode('utf-8')
+    for html_path in html_paths:
+        with open(html_path, 'rb') as file:
+            fixtures[os.path.basename(html_path)] = file.read()
+    for name, content in fixtures.items():
+        reference = list(parse_products(content, 'html5lib'))
+        for parser in available_parsers():
+            if list(parse_products(content, parser)) != reference:
+                raise ValueError(
+                    f'Parser {parser} does not match html5lib on {name}'
+                )
+            recorder.run(
+                'parse_products',
+                lambda: list(parse_products(content, parser)),
+                fixture=name,
+                parser=parser,
+                bytes=len(content),
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Benchmark loading, searching, encoding and parsing.'
+    )
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--load-repeat', type=int, default=1)
+    parser.add_argument('--legacy-max-rows', type=int, default=LEGACY_MAX_ROWS)
+    parser.add_argument(
+        '--html', nargs='*', default=[], help='saved catalog pages to parse'
+    )
+    parser.add_argument('--parse-products', type=int, default=PARSE_PRODUCTS)
+    parser.add_argument('--output', default='-')
+    args = parser.parse_args()
+
+    recorder = Recorder(args.repeat)
+    for rows in args.sizes:
+        bench_size(recorder, rows, args.legacy_max_rows, args.load_repeat)
+    bench_parse(recorder, args.html, args.parse_products)
+
+    report = {
+        'meta': {
+            'commit': git_commit(),
+            'time': time.time(),
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+        },
+        'results': recorder.results,
+    }
+    if args.output == '-':
+        json.dump(report, sys.stdout, indent=4)
+        print()
+    else:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+import sys
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+def sizeof(value: Any) -> int:
+    nbytes = getattr(value, 'nbytes', None)
+    if nbytes is not None:
+        return int(nbytes)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(map(sys.getsizeof, value))
+    return sys.getsizeof(value)
+
+
+class LRUCache:
+    def __init__(
+        self,
+        max_entries: int = 128,
+        max_bytes: int = 64 * 2**20,
+        sizer: Callable[[Any], int] = sizeof,
+    ) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizer = sizer
+        self.entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self.sizes: Dict[Hashable, int] = {}
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self.entries
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self.lock:
+            if key not in self.entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        size = self.sizer(value)
+        with self.lock:
+            if key in self.entries:
+                self.nbytes -= self.sizes.pop(key)
+                del self.entries[key]
+            if self.max_entries <= 0 or size > self.max_bytes:
+                return
+            self.entries[key] = value
+            self.sizes[key] = size
+            self.nbytes += size
+            while (
+                len(self.entries) > self.max_entries
+                or self.nbytes > self.max_bytes
+            ):
+                evicted, _ = self.entries.popitem(last=False)
+                self.nbytes -= self.sizes.pop(evicted)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'max_entries': self.max_entries,
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
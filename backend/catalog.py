@@ -0,0 +1,616 @@
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+import numpy as np
+
+from . import data
+from .cache import LRUCache
+from .metrics import ROWS_SCANNED
+from .textindex import DIMENSION_COLUMNS, TextIndex, dimensions, tokenize
+
+NUMERIC_COLUMNS = (
+    'index',
+    'length',
+    'base_weight',
+    'price',
+    'price_per_foot',
+    'price_per_pound',
+)
+CATEGORICAL_COLUMNS = ('product_id', 'material', 'shape', 'size', 'desc')
+SORT_COLUMNS = NUMERIC_COLUMNS + CATEGORICAL_COLUMNS
+SORT_TIEBREAKERS = ('index', 'length', 'price', 'base_weight')
+FILTER_COLUMNS = {
+    'length': 'length',
+    'poundsPerFoot': 'base_weight',
+    'price': 'price',
+    'pricePerFoot': 'price_per_foot',
+    'pricePerPound': 'price_per_pound',
+    'thickness': 'thickness',
+    'width': 'width',
+    'od': 'od',
+}
+
+INDEXED_COLUMNS = {'material': data.materials, 'shape': data.shapes}
+POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], np.uint8)
+STREAM_CHUNK = 256
+STREAM_MAX_CHUNK = 65536
+HISTOGRAM_BINS = 10
+DENSE_FRACTION = 0.125
+ORDER_CACHE_ENTRIES = 8
+ORDER_CACHE_BYTES = 64 * 2**20
+
+Bounds = Dict[str, Tuple[Optional[float], Optional[float]]]
+SortKeys = Tuple[Tuple[str, bool], ...]
+FilterSignature = Tuple[
+    Optional[Tuple[str, ...]],
+    Optional[Tuple[str, ...]],
+    Tuple[Tuple[str, Tuple[Optional[float], Optional[float]]], ...],
+    Tuple[str, ...],
+]
+
+
+def parse_bounds(filters: Dict[str, Optional[str]]) -> Bounds:
+    bounds: Bounds = {}
+    for key, column in FILTER_COLUMNS.items():
+        lower = filters.get(key + 'Lower')
+        upper = filters.get(key + 'Upper')
+        if lower is None and upper is None:
+            continue
+        bounds[column] = (
+            None if lower is None else float(lower),
+            None if upper is None else float(upper),
+        )
+    return bounds
+
+
+def parse_sort(attribute: str) -> SortKeys:
+    keys = []
+    for name in attribute.split(','):
+        column = name.removeprefix('-')
+        if column not in SORT_COLUMNS:
+            raise ValueError(
+                f'Unknown sort column {column}, expected one of '
+                f'{list(SORT_COLUMNS)}'
+            )
+        keys.append((column, not name.startswith('-')))
+    columns = [column for column, _ in keys]
+    if len(set(columns)) != len(columns):
+        raise ValueError(f'Duplicate sort columns in {attribute}')
+    return tuple(keys) + tuple(
+        (column, True) for column in SORT_TIEBREAKERS if column not in columns
+    )
+
+
+def sort_keys(attribute: str, ascending: bool) -> Tuple[SortKeys, bool]:
+    keys = parse_sort(attribute)
+    if keys[0][1]:
+        return keys, not ascending
+    return tuple((column, not order) for column, order in keys), ascending
+
+
+DEFAULT_SORTS = frozenset(parse_sort(column) for column in SORT_COLUMNS)
+
+
+def filter_signature(
+    materials: Optional[List[str]],
+    shapes: Optional[List[str]],
+    filters: Dict[str, Optional[str]],
+) -> FilterSignature:
+    return (
+        None if materials is None else tuple(sorted(set(materials))),
+        None if shapes is None else tuple(sorted(set(shapes))),
+        tuple(sorted(parse_bounds(filters).items())),
+        tokenize(filters.get('q') or ''),
+    )
+
+
+class ColumnarCatalog:
+    def __init__(
+        self,
+        columns: Dict[str, np.ndarray],
+        categories: Dict[str, List[str]],
+        codes: Dict[str, np.ndarray],
+    ) -> None:
+        self.columns = columns
+        self.categories = categories
+        self.codes = codes
+        self.size = len(columns['index'])
+        self.column_ranks: Dict[str, np.ndarray] = {}
+        self.sort_cache: Dict[SortKeys, np.ndarray] = {}
+        self.rank_cache: Dict[SortKeys, np.ndarray] = {}
+        self.order_cache = LRUCache(ORDER_CACHE_ENTRIES, ORDER_CACHE_BYTES)
+        self.range_indexes: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        for column, known_values in INDEXED_COLUMNS.items():
+            column_codes = self.codes[column]
+            values = sorted(set(self.categories[column]) | set(known_values))
+            lookup = {
+                value: code
+                for code, value in enumerate(self.categories[column])
+            }
+            self.bitmaps[column] = {
+                value: np.packbits(column_codes == lookup.get(value, -1))
+                for value in values
+            }
+        self.bitmap_counts = {
+            column: self.facet_counts(column) for column in self.bitmaps
+        }
+        self.text_index = TextIndex(
+            {column: self.categories[column] for column in ('size', 'desc')}
+        )
+        self.dimensions = self.dimension_columns()
+
+    def dimension_columns(self) -> Dict[str, np.ndarray]:
+        shapes = self.categories['shape']
+        sizes = self.categories['size']
+        descs = self.categories['desc']
+        keys, inverse = np.unique(
+            (
+                self.codes['shape'].astype(np.int64) * len(sizes)
+                + self.codes['size']
+            )
+            * len(descs)
+            + self.codes['desc'],
+            return_inverse=True,
+        )
+        values = np.array(
+            [
+                dimensions(
+                    shapes[key // (len(sizes) * len(descs))],
+                    sizes[key // len(descs) % len(sizes)],
+                    descs[key % len(descs)],
+                )
+                for key in keys.tolist()
+            ],
+            dtype=np.float64,
+        ).reshape(len(keys), len(DIMENSION_COLUMNS))
+        return {
+            column: values[:, position][inverse]
+            for position, column in enumerate(DIMENSION_COLUMNS)
+        }
+
+    def values(self, column: str) -> np.ndarray:
+        if column in self.columns:
+            return self.columns[column]
+        return self.dimensions[column]
+
+    def text_mask(
+        self, query: str, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        mask = np.ones(self.size if rows is None else len(rows), dtype=bool)
+        for token in tokenize(query):
+            token_mask = np.zeros_like(mask)
+            for column, codes in self.text_index.lookup(token).items():
+                lookup = np.zeros(len(self.categories[column]), dtype=bool)
+                lookup[codes] = True
+                column_codes = self.codes[column]
+                if rows is not None:
+                    column_codes = column_codes[rows]
+                token_mask |= lookup[column_codes]
+            mask &= token_mask
+        return mask
+
+    @classmethod
+    def from_rows(cls, rows: Sequence[Any]) -> 'ColumnarCatalog':
+        size = len(rows)
+        columns: Dict[str, np.ndarray] = {}
+        for column in NUMERIC_COLUMNS:
+            dtype = np.int64 if column in ('index', 'length') else np.float64
+            columns[column] = np.fromiter(
+                (getattr(row, column) for row in rows), dtype=dtype, count=size
+            )
+        categories: Dict[str, List[str]] = {}
+        codes: Dict[str, np.ndarray] = {}
+        for column in CATEGORICAL_COLUMNS:
+            values = [getattr(row, column) for row in rows]
+            categories[column] = sorted(set(values))
+            lookup = {
+                value: code for code, value in enumerate(categories[column])
+            }
+            codes[column] = np.fromiter(
+                (lookup[value] for value in values), dtype=np.int32, count=size
+            )
+        return cls(columns, categories, codes)
+
+    def row(self, index: int) -> Dict[str, Any]:
+        row: Dict[str, Any] = {
+            column: values[index].item()
+            for column, values in self.columns.items()
+        }
+        for column, codes in self.codes.items():
+            row[column] = self.categories[column][codes[index]]
+        return row
+
+    def rows(
+        self, indices: np.ndarray, columns: Sequence[str]
+    ) -> List[Tuple[Any, ...]]:
+        values = []
+        for column in columns:
+            if column in self.columns:
+                values.append(self.columns[column][indices].tolist())
+            else:
+                categories = self.categories[column]
+                values.append(
+                    [
+                        categories[code]
+                        for code in self.codes[column][indices].tolist()
+                    ]
+                )
+        return list(zip(*values))
+
+    def ranks(self, column: str) -> np.ndarray:
+        if column not in self.column_ranks:
+            if column in self.codes:
+                ranks = self.codes[column]
+            elif column in self.columns:
+                _, ranks = np.unique(self.columns[column], return_inverse=True)
+                ranks = ranks.astype(np.int32)
+            else:
+                raise KeyError(f'Unknown column {column}')
+            self.column_ranks[column] = ranks
+        return self.column_ranks[column]
+
+    def lexsort(
+        self, keys: SortKeys, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        columns = []
+        for column, ascending in reversed(keys):
+            ranks = self.ranks(column)
+            if rows is not None:
+                ranks = ranks[rows]
+            columns.append(ranks if ascending else ~ranks)
+        return np.lexsort(columns)
+
+    def sorted(self, attribute: str, ascending: bool) -> bool:
+        keys = sort_keys(attribute, ascending)[0]
+        return keys in self.sort_cache or ('order', keys) in self.order_cache
+
+    def cached_sort(
+        self,
+        cache: Dict[SortKeys, np.ndarray],
+        kind: str,
+        keys: SortKeys,
+        build: Callable[[], np.ndarray],
+    ) -> np.ndarray:
+        if keys in DEFAULT_SORTS:
+            if keys not in cache:
+                cache[keys] = build()
+            return cache[keys]
+        value = self.order_cache.get((kind, keys))
+        if value is None:
+            value = build()
+            self.order_cache.put((kind, keys), value)
+        return value
+
+    def permutation(self, keys: SortKeys) -> np.ndarray:
+        return self.cached_sort(
+            self.sort_cache, 'order', keys, lambda: self.lexsort(keys)
+        )
+
+    def inverse(self, keys: SortKeys) -> np.ndarray:
+        ranks = np.empty(self.size, dtype=np.int64)
+        ranks[self.permutation(keys)] = np.arange(self.size)
+        return ranks
+
+    def sort_order(self, attribute: str, ascending: bool) -> np.ndarray:
+        keys, reverse = sort_keys(attribute, ascending)
+        permutation = self.permutation(keys)
+        return permutation[::-1] if reverse else permutation
+
+    def sort_ranks(
+        self,
+        attribute: str,
+        ascending: bool,
+        rows: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        keys, reverse = sort_keys(attribute, ascending)
+        ranks = self.cached_sort(
+            self.rank_cache, 'ranks', keys, lambda: self.inverse(keys)
+        )
+        if rows is not None:
+            ranks = ranks[rows]
+        return self.size - 1 - ranks if reverse else ranks
+
+    def top(
+        self,
+        attribute: str,
+        ascending: bool,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, Optional[str]],
+        count: int,
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        keys, reverse = sort_keys(attribute, ascending)
+        primary = self.ranks(keys[0][0])
+        rows = self.matching_rows(materials, shapes, filters)
+        if rows is None:
+            mask = self.mask(materials, shapes, filters)
+            matching = primary[mask]
+        else:
+            matching = primary[rows]
+        if len(matching) <= count:
+            return None
+        if reverse:
+            threshold = np.partition(matching, len(matching) - count)[
+                len(matching) - count
+            ]
+            candidates = np.flatnonzero(primary >= threshold)
+        else:
+            threshold = np.partition(matching, count - 1)[count - 1]
+            candidates = np.flatnonzero(primary <= threshold)
+        if len(candidates) > self.size * DENSE_FRACTION:
+            return None
+        order = candidates[self.lexsort(keys, candidates)]
+        if reverse:
+            order = order[::-1]
+        if rows is None:
+            hits = mask[order]
+        else:
+            hits = np.isin(order, rows, assume_unique=True)
+        positions = np.flatnonzero(hits)[:count]
+        return positions, order[positions]
+
+    def warm(self) -> None:
+        for column in SORT_COLUMNS:
+            self.sort_ranks(column, True)
+        for column in FILTER_COLUMNS.values():
+            self.range_index(column)
+
+    def range_index(self, column: str) -> Tuple[np.ndarray, np.ndarray]:
+        if column not in self.range_indexes:
+            values = self.values(column)
+            order = np.argsort(values, kind='stable')
+            self.range_indexes[column] = (order, values[order])
+        return self.range_indexes[column]
+
+    def range_slice(
+        self, column: str, lower: Optional[float], upper: Optional[float]
+    ) -> Tuple[int, int]:
+        _, values = self.range_index(column)
+        start = 0
+        stop = len(values)
+        if lower is not None:
+            start = int(np.searchsorted(values, lower, side='left'))
+        if upper is not None:
+            stop = int(np.searchsorted(values, upper, side='right'))
+        return start, max(start, stop)
+
+    def range_rows(self, bounds: Bounds) -> Optional[np.ndarray]:
+        if not bounds:
+            return None
+        slices = []
+        for column, (lower, upper) in bounds.items():
+            start, stop = self.range_slice(column, lower, upper)
+            slices.append((stop - start, column, start, stop))
+        slices.sort()
+        width, column, start, stop = slices[0]
+        if width > self.size * DENSE_FRACTION:
+            return None
+        order, _ = self.range_index(column)
+        return np.sort(order[start:stop])
+
+    def matching_rows(
+        self,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, Optional[str]],
+    ) -> Optional[np.ndarray]:
+        if filters.get('q'):
+            rows = np.flatnonzero(self.text_mask(filters['q']))
+            if len(rows) <= self.size * DENSE_FRACTION:
+                return rows[self.mask(materials, shapes, filters, rows)]
+        bounds = parse_bounds(filters)
+        rows = self.range_rows(bounds)
+        if rows is not None:
+            return rows[self.mask(materials, shapes, filters, rows)]
+        estimate = self.category_estimate(materials, shapes)
+        if estimate is None or estimate > self.size * DENSE_FRACTION:
+            return None
+        bitmap = self.category_bitmap(materials, shapes)
+        rows = np.flatnonzero(self.bitmap_mask(bitmap))
+        return rows[self.mask(materials, shapes, filters, rows)]
+
+    def category_estimate(
+        self, materials: Optional[List[str]], shapes: Optional[List[str]]
+    ) -> Optional[int]:
+        estimates = [
+            sum(
+                self.bitmap_counts[column].get(value, 0)
+                for value in set(values)
+            )
+            for column, values in (('material', materials), ('shape', shapes))
+            if values is not None
+        ]
+        return min(estimates, default=None)
+
+    def column_bitmap(
+        self, column: str, values: Optional[List[str]]
+    ) -> Optional[np.ndarray]:
+        if values is None:
+            return None
+        bitmaps = self.bitmaps[column]
+        bitmap = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+        for value in set(values):
+            if value in bitmaps:
+                bitmap |= bitmaps[value]
+        return bitmap
+
+    def category_bitmap(
+        self, materials: Optional[List[str]], shapes: Optional[List[str]]
+    ) -> Optional[np.ndarray]:
+        combined = None
+        for column, values in (('material', materials), ('shape', shapes)):
+            bitmap = self.column_bitmap(column, values)
+            if bitmap is not None:
+                combined = bitmap if combined is None else combined & bitmap
+        return combined
+
+    def bitmap_mask(
+        self, bitmap: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        if rows is None:
+            return np.unpackbits(bitmap, count=self.size).view(bool)
+        return ((bitmap[rows >> 3] >> (7 - (rows & 7))) & 1).astype(bool)
+
+    def facet_counts(
+        self, column: str, bitmap: Optional[np.ndarray] = None
+    ) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for value, value_bitmap in self.bitmaps[column].items():
+            if bitmap is not None:
+                value_bitmap = value_bitmap & bitmap
+            counts[value] = int(POPCOUNT[value_bitmap].sum())
+        return counts
+
+    def facets(
+        self,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, Optional[str]],
+        bins: int = HISTOGRAM_BINS,
+    ) -> Dict[str, Any]:
+        ROWS_SCANNED.inc(self.size)
+        numeric_mask = self.bounds_mask(parse_bounds(filters))
+        if filters.get('q'):
+            numeric_mask &= self.text_mask(filters['q'])
+        category_masks = {}
+        for column, values in (('material', materials), ('shape', shapes)):
+            bitmap = self.column_bitmap(column, values)
+            if bitmap is not None:
+                category_masks[column] = self.bitmap_mask(bitmap)
+
+        facets: Dict[str, Any] = {}
+        for column, key in (('material', 'materials'), ('shape', 'shapes')):
+            mask = numeric_mask.copy()
+            for other, other_mask in category_masks.items():
+                if other != column:
+                    mask &= other_mask
+            counts = np.bincount(
+                self.codes[column][mask],
+                minlength=len(self.categories[column]),
+            )
+            by_value = dict(zip(self.categories[column], counts.tolist()))
+            facets[key] = {
+                value: by_value.get(value, 0)
+                for value in INDEXED_COLUMNS[column]
+                + sorted(set(by_value) - set(INDEXED_COLUMNS[column]))
+            }
+
+        mask = numeric_mask
+        for category_mask in category_masks.values():
+            mask &= category_mask
+        facets['total'] = int(np.count_nonzero(mask))
+        facets['ranges'] = {}
+        for key, column in FILTER_COLUMNS.items():
+            values = self.values(column)[mask]
+            values = values[np.isfinite(values)]
+            if len(values) == 0:
+                facets['ranges'][key] = None
+                continue
+            counts, edges = np.histogram(values, bins=bins)
+            facets['ranges'][key] = {
+                'min': values.min().item(),
+                'max': values.max().item(),
+                'edges': edges.tolist(),
+                'counts': counts.tolist(),
+            }
+        return facets
+
+    def bounds_mask(
+        self, bounds: Bounds, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        mask = np.ones(self.size if rows is None else len(rows), dtype=bool)
+        for column, (lower, upper) in bounds.items():
+            values = self.values(column)
+            if rows is not None:
+                values = values[rows]
+            if lower is not None:
+                mask &= values >= lower
+            if upper is not None:
+                mask &= values <= upper
+        return mask
+
+    def mask(
+        self,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, Optional[str]],
+        rows: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        ROWS_SCANNED.inc(self.size if rows is None else len(rows))
+        mask = self.bounds_mask(parse_bounds(filters), rows)
+        if filters.get('q'):
+            mask &= self.text_mask(filters['q'], rows)
+        bitmap = self.category_bitmap(materials, shapes)
+        if bitmap is not None:
+            mask &= self.bitmap_mask(bitmap, rows)
+        return mask
+
+    def count(
+        self,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, Optional[str]],
+    ) -> int:
+        rows = self.matching_rows(materials, shapes, filters)
+        if rows is not None:
+            return len(rows)
+        return int(np.count_nonzero(self.mask(materials, shapes, filters)))
+
+    def stream(
+        self,
+        permutation: np.ndarray,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, Optional[str]],
+        start: int = 0,
+    ) -> Iterator[Tuple[int, int]]:
+        position = start
+        chunk_size = STREAM_CHUNK
+        while position < len(permutation):
+            rows = permutation[position : position + chunk_size]
+            mask = self.mask(materials, shapes, filters, rows)
+            for offset in np.flatnonzero(mask).tolist():
+                yield position + offset, int(rows[offset])
+            position += len(rows)
+            chunk_size = min(chunk_size * 2, STREAM_MAX_CHUNK)
+
+    def positions(
+        self,
+        attribute: str,
+        ascending: bool,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, Optional[str]],
+    ) -> np.ndarray:
+        rows = self.matching_rows(materials, shapes, filters)
+        if rows is None:
+            mask = self.mask(materials, shapes, filters)
+        elif len(rows) <= self.size * DENSE_FRACTION:
+            return np.sort(self.sort_ranks(attribute, ascending, rows))
+        else:
+            mask = np.zeros(self.size, dtype=bool)
+            mask[rows] = True
+        permutation = self.sort_order(attribute, ascending)
+        return np.flatnonzero(mask[permutation])
+
+    def search(
+        self,
+        attribute: str,
+        ascending: bool,
+        materials: Optional[List[str]],
+        shapes: Optional[List[str]],
+        filters: Dict[str, Optional[str]],
+    ) -> np.ndarray:
+        permutation = self.sort_order(attribute, ascending)
+        return permutation[
+            self.positions(attribute, ascending, materials, shapes, filters)
+        ]
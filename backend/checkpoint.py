@@ -0,0 +1,117 @@
+import contextlib
+import dataclasses
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import IO, Any, Dict, Iterator, List, Optional
+
+MANIFEST_FILE = 'scrape.manifest.json'
+JOURNAL_FILE = 'scrape.journal'
+
+
+@contextlib.contextmanager
+def atomic_write(file_path: str, mode: str = 'w') -> Iterator[IO[Any]]:
+    temp_path = file_path + '.tmp'
+    with open(temp_path, mode) as file:
+        yield file
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, file_path)
+
+
+class Checkpoint:
+    def __init__(
+        self, path: str, pages: Dict[str, str], resume: bool = False
+    ) -> None:
+        self.manifest_path = os.path.join(path, MANIFEST_FILE)
+        self.journal_path = os.path.join(path, JOURNAL_FILE)
+        self.lock = threading.Lock()
+        manifest = self.read_manifest() if resume else None
+        self.resumed = False
+        if (
+            manifest is not None
+            and not manifest['finished']
+            and manifest['pages'].keys() == pages.keys()
+        ):
+            self.resumed = True
+            self.manifest = manifest
+        else:
+            self.manifest = {
+                'started_at': time.time(),
+                'finished': False,
+                'pages': {
+                    file_name: {'url': url, 'state': 'pending'}
+                    for file_name, url in pages.items()
+                },
+            }
+            if os.path.exists(self.journal_path):
+                os.remove(self.journal_path)
+        self.journal = open(self.journal_path, 'a')
+        self.write_manifest()
+
+    def read_manifest(self) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.manifest_path, 'r') as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def write_manifest(self) -> None:
+        with atomic_write(self.manifest_path) as file:
+            json.dump(self.manifest, file, indent=4)
+
+    def complete(self, file_name: str) -> bool:
+        return self.manifest['pages'][file_name]['state'] == 'complete'
+
+    def mark(self, file_name: str, state: str, **counts: int) -> None:
+        with self.lock:
+            page = self.manifest['pages'][file_name]
+            page['state'] = state
+            page['updated_at'] = time.time()
+            page.update(counts)
+            self.write_manifest()
+
+    def journaled(self) -> List[Dict[str, Any]]:
+        if not self.resumed:
+            return []
+        entries = []
+        with open(self.journal_path, 'r') as file:
+            for line in file:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    break
+        return entries
+
+    def record(self, entries: List[Dict[str, Any]]) -> None:
+        lines = ''.join(json.dumps(entry) + '\n' for entry in entries)
+        with self.lock:
+            self.journal.write(lines)
+            self.journal.flush()
+
+    def record_future(self, future: 'Future[Dict[str, Any]]') -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.record(
+            [dataclasses.asdict(entry) for entry in future.result().values()]
+        )
+
+    def finish(self) -> None:
+        with self.lock:
+            self.manifest['finished'] = True
+            self.manifest['finished_at'] = time.time()
+            self.write_manifest()
+        self.close()
+        os.remove(self.journal_path)
+
+    def close(self) -> None:
+        if not self.journal.closed:
+            self.journal.close()
+
+    def __enter__(self) -> 'Checkpoint':
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
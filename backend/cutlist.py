@@ -0,0 +1,317 @@
+import bisect
+import dataclasses
+import itertools
+import math
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .catalog import ColumnarCatalog
+
+INCHES_PER_FOOT = 12
+DEFAULT_KERF = 0.125
+MAX_PIECES = 500
+EXACT_MAX_PIECES = 12
+EXACT_MAX_NODES = 200000
+TOLERANCE = 1e-9
+CUT_RE = re.compile(r'^\s*(\d*\.?\d+)\s*(?:[x*]\s*(\d+))?\s*$')
+
+SizeKey = Tuple[str, str, str]
+Packing = List[List[float]]
+
+
+@dataclasses.dataclass
+class PriceTable:
+    lengths: List[int]
+    capacities: List[float]
+    prices: List[float]
+    product_ids: List[str]
+    cheapest: List[int]
+
+    def stock(self, needed: float) -> Optional[int]:
+        position = bisect.bisect_left(self.capacities, needed - TOLERANCE)
+        if position == len(self.capacities):
+            return None
+        return self.cheapest[position]
+
+    def cost(self, needed: float) -> float:
+        stock = self.stock(needed)
+        return math.inf if stock is None else self.prices[stock]
+
+
+@dataclasses.dataclass
+class Bar:
+    length: int
+    price: float
+    product_id: str
+    cuts: List[float]
+    waste: float
+
+
+@dataclasses.dataclass
+class Purchase:
+    length: int
+    quantity: int
+    price: float
+    product_id: str
+
+
+@dataclasses.dataclass
+class CutPlan:
+    material: str
+    shape: str
+    size: str
+    kerf: float
+    total: float
+    optimal: bool
+    purchases: List[Purchase]
+    bars: List[Bar]
+
+
+def price_table(
+    lengths: List[int], prices: List[float], product_ids: List[str]
+) -> PriceTable:
+    cheapest = list(range(len(lengths)))
+    for position in reversed(range(len(lengths) - 1)):
+        following = cheapest[position + 1]
+        if prices[following] < prices[position]:
+            cheapest[position] = following
+    return PriceTable(
+        lengths,
+        [float(length * INCHES_PER_FOOT) for length in lengths],
+        prices,
+        product_ids,
+        cheapest,
+    )
+
+
+def price_tables(catalog: ColumnarCatalog) -> Dict[SizeKey, PriceTable]:
+    codes = catalog.codes
+    lengths = catalog.columns['length']
+    prices = catalog.columns['price']
+    valid = np.flatnonzero((prices > 0) & (lengths > 0))
+    order = valid[
+        np.lexsort(
+            (
+                prices[valid],
+                lengths[valid],
+                codes['size'][valid],
+                codes['shape'][valid],
+                codes['material'][valid],
+            )
+        )
+    ]
+    keys = np.stack(
+        [
+            codes['material'][order],
+            codes['shape'][order],
+            codes['size'][order],
+            lengths[order],
+        ]
+    )
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (keys[:, 1:] != keys[:, :-1]).any(axis=0)
+    rows = order[first]
+
+    categories = catalog.categories
+    tables: Dict[SizeKey, PriceTable] = {}
+    for (material, shape, size), group in itertools.groupby(
+        zip(
+            codes['material'][rows].tolist(),
+            codes['shape'][rows].tolist(),
+            codes['size'][rows].tolist(),
+            lengths[rows].tolist(),
+            prices[rows].tolist(),
+            codes['product_id'][rows].tolist(),
+        ),
+        key=lambda row: row[:3],
+    ):
+        _, _, _, group_lengths, group_prices, product_ids = zip(*group)
+        tables[
+            categories['material'][material],
+            categories['shape'][shape],
+            categories['size'][size],
+        ] = price_table(
+            list(group_lengths),
+            list(group_prices),
+            [categories['product_id'][code] for code in product_ids],
+        )
+    return tables
+
+
+def parse_cuts(text: str) -> List[float]:
+    pieces: List[float] = []
+    for item in text.split(','):
+        match = CUT_RE.match(item)
+        if match is None:
+            raise ValueError(
+                f'Invalid cut {item!r}, expected a length in inches '
+                'optionally followed by x and a quantity'
+            )
+        length, quantity = match.groups()
+        count = int(quantity or 1)
+        if len(pieces) + count > MAX_PIECES:
+            raise ValueError(f'Cut list has more than {MAX_PIECES} pieces')
+        pieces.extend([float(length)] * count)
+    return pieces
+
+
+def needed(bar: List[float], kerf: float) -> float:
+    return sum(bar) + kerf * (len(bar) - 1)
+
+
+def packing_cost(packing: Packing, table: PriceTable, kerf: float) -> float:
+    return sum(table.cost(needed(bar, kerf)) for bar in packing)
+
+
+def best_fit_decreasing(
+    pieces: List[float], table: PriceTable, kerf: float
+) -> Packing:
+    best: Optional[Packing] = None
+    best_cost = math.inf
+    for capacity in table.capacities:
+        bars: Packing = []
+        free: List[Tuple[float, int]] = []
+        for piece in pieces:
+            size = piece + kerf
+            position = bisect.bisect_left(free, (size - TOLERANCE, -1))
+            if position < len(free):
+                remaining, bar = free.pop(position)
+                bars[bar].append(piece)
+            else:
+                smallest = bisect.bisect_left(
+                    table.capacities, piece - TOLERANCE
+                )
+                limit = max(capacity, table.capacities[smallest])
+                remaining, bar = limit + kerf, len(bars)
+                bars.append([piece])
+            bisect.insort(free, (remaining - size, bar))
+        cost = packing_cost(bars, table, kerf)
+        if cost < best_cost - TOLERANCE:
+            best, best_cost = bars, cost
+    assert best is not None
+    return best
+
+
+def branch_and_bound(
+    pieces: List[float],
+    table: PriceTable,
+    kerf: float,
+    incumbent: Packing,
+) -> Tuple[Packing, bool]:
+    sizes = [piece + kerf for piece in pieces]
+    rate = min(
+        price / (capacity + kerf)
+        for price, capacity in zip(table.prices, table.capacities)
+    )
+    floor = rate * sum(sizes)
+    best = [list(bar) for bar in incumbent]
+    best_cost = packing_cost(incumbent, table, kerf)
+    loads: List[float] = []
+    bars: Packing = []
+    nodes = 0
+
+    def cost(load: float) -> float:
+        return table.cost(load - kerf)
+
+    def search(position: int, spent: float) -> bool:
+        nonlocal best, best_cost, nodes
+        nodes += 1
+        if nodes > EXACT_MAX_NODES:
+            return False
+        if max(spent, floor) >= best_cost - TOLERANCE:
+            return True
+        if position == len(pieces):
+            best = [list(bar) for bar in bars]
+            best_cost = spent
+            return True
+        piece, size = pieces[position], sizes[position]
+        seen = set()
+        for bar, load in enumerate(loads):
+            if load in seen:
+                continue
+            seen.add(load)
+            added = cost(load + size) - cost(load)
+            if math.isinf(added):
+                continue
+            loads[bar] += size
+            bars[bar].append(piece)
+            complete = search(position + 1, spent + added)
+            loads[bar] = load
+            bars[bar].pop()
+            if not complete:
+                return False
+        loads.append(size)
+        bars.append([piece])
+        complete = search(position + 1, spent + cost(size))
+        loads.pop()
+        bars.pop()
+        return complete
+
+    complete = search(0, 0.0)
+    return best, complete
+
+
+def optimize(
+    tables: Dict[SizeKey, PriceTable],
+    material: str,
+    shape: str,
+    size: str,
+    pieces: List[float],
+    kerf: float = DEFAULT_KERF,
+) -> CutPlan:
+    table = tables.get((material, shape, size))
+    if table is None:
+        raise ValueError(f'No prices for {material}, {shape}, {size}')
+    if not pieces:
+        raise ValueError('Cut list is empty')
+    if len(pieces) > MAX_PIECES:
+        raise ValueError(f'Cut list has more than {MAX_PIECES} pieces')
+    if not math.isfinite(kerf) or kerf < 0 or min(pieces) <= 0:
+        raise ValueError(
+            'Cut lengths must be positive and kerf finite and non-negative'
+        )
+    longest = table.capacities[-1]
+    if max(pieces) > longest + TOLERANCE:
+        raise ValueError(
+            f'Cut of {max(pieces)} in is longer than the longest stock '
+            f'length of {longest:g} in'
+        )
+
+    pieces = sorted(pieces, reverse=True)
+    packing = best_fit_decreasing(pieces, table, kerf)
+    optimal = False
+    if len(pieces) <= EXACT_MAX_PIECES:
+        packing, optimal = branch_and_bound(pieces, table, kerf, packing)
+
+    bars = []
+    for cuts in packing:
+        stock = table.stock(needed(cuts, kerf))
+        assert stock is not None
+        bars.append(
+            Bar(
+                table.lengths[stock],
+                table.prices[stock],
+                table.product_ids[stock],
+                cuts,
+                table.capacities[stock] - needed(cuts, kerf),
+            )
+        )
+    bars.sort(key=lambda bar: (-bar.length, bar.waste))
+    purchases = []
+    for length, group in itertools.groupby(bars, key=lambda bar: bar.length):
+        stock = list(group)
+        purchases.append(
+            Purchase(length, len(stock), stock[0].price, stock[0].product_id)
+        )
+    return CutPlan(
+        material,
+        shape,
+        size,
+        kerf,
+        round(sum(bar.price for bar in bars), 2),
+        optimal,
+        purchases,
+        bars,
+    )
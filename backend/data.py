@@ -1,3 +1,5 @@
+DATA_DIR = 'metalscrape'
+
 materials = [
     'Steel',
     'Galvanized Steel',
@@ -0,0 +1,172 @@
+import argparse
+import contextlib
+import csv
+import io
+import itertools
+import json
+import sys
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qsl
+
+import numpy as np
+
+from .app import SpecificProduct, SpecificProducts, load_catalog, parse_filters
+from .catalog import parse_bounds, parse_sort
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+EXPORT_COLUMNS = tuple(SpecificProduct.__dataclass_fields__)
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+EXPORT_BATCH = 1024
+
+
+def parse_columns(text: Optional[str]) -> Tuple[str, ...]:
+    if not text:
+        return EXPORT_COLUMNS
+    columns = tuple(text.split(','))
+    unknown = [column for column in columns if column not in EXPORT_COLUMNS]
+    if unknown:
+        raise ValueError(
+            f'Unknown columns {unknown}, expected some of {EXPORT_COLUMNS}'
+        )
+    return columns
+
+
+def export_rows(
+    specific_products: SpecificProducts,
+    columns: Sequence[str],
+    attribute: str,
+    ascending: bool,
+    materials: Optional[List[str]],
+    shapes: Optional[List[str]],
+    filters: Dict[str, Optional[str]],
+) -> Iterator[List[Tuple[Any, ...]]]:
+    matches = specific_products.matches(
+        attribute, ascending, materials, shapes, filters
+    )
+    catalog = specific_products.catalog
+    while True:
+        batch = [index for _, index in itertools.islice(matches, EXPORT_BATCH)]
+        if not batch:
+            return
+        if catalog is not None:
+            yield catalog.rows(np.array(batch), columns)
+        else:
+            yield [
+                tuple(
+                    getattr(specific_products.specific_products[index], column)
+                    for column in columns
+                )
+                for index in batch
+            ]
+
+
+def encode_ndjson(
+    columns: Sequence[str], batches: Iterator[List[Tuple[Any, ...]]]
+) -> Iterator[bytes]:
+    for rows in batches:
+        records = (dict(zip(columns, row)) for row in rows)
+        if orjson is not None:
+            yield b''.join(
+                orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE)
+                for record in records
+            )
+        else:
+            yield ''.join(
+                json.dumps(record, separators=(',', ':')) + '\n'
+                for record in records
+            ).encode('utf-8')
+
+
+def encode_csv(
+    columns: Sequence[str], batches: Iterator[List[Tuple[Any, ...]]]
+) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in itertools.chain([[]], batches):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+
+ENCODERS = {'ndjson': encode_ndjson, 'csv': encode_csv}
+
+
+def export(
+    specific_products: SpecificProducts,
+    export_format: str,
+    columns: Sequence[str],
+    attribute: str,
+    ascending: bool,
+    materials: Optional[List[str]],
+    shapes: Optional[List[str]],
+    filters: Dict[str, Optional[str]],
+) -> Iterator[bytes]:
+    if export_format not in ENCODERS:
+        raise ValueError(
+            f'Unknown format {export_format}, expected one of '
+            f'{list(ENCODERS)}'
+        )
+    parse_sort(attribute)
+    parse_bounds(filters)
+    batches = export_rows(
+        specific_products,
+        columns,
+        attribute,
+        ascending,
+        materials,
+        shapes,
+        filters,
+    )
+    return ENCODERS[export_format](columns, batches)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description='Export every product matching a search query.'
+    )
+    parser.add_argument('--format', choices=list(ENCODERS), default='ndjson')
+    parser.add_argument(
+        '--columns', help='comma separated columns, all by default'
+    )
+    parser.add_argument('--sort', default='index')
+    parser.add_argument('--descending', action='store_true')
+    parser.add_argument(
+        '--query',
+        default='',
+        help='filters as a /products query string, '
+        'e.g. materials=Steel&priceUpper=100',
+    )
+    parser.add_argument('--data', default=None)
+    parser.add_argument('--output', default='-')
+    args = parser.parse_args()
+
+    materials, shapes, filters = parse_filters(dict(parse_qsl(args.query)))
+    with contextlib.redirect_stdout(sys.stderr):
+        specific_products = load_catalog(args.data)
+    chunks = export(
+        specific_products,
+        args.format,
+        parse_columns(args.columns),
+        args.sort,
+        not args.descending,
+        materials,
+        shapes,
+        filters,
+    )
+    if args.output == '-':
+        for chunk in chunks:
+            sys.stdout.buffer.write(chunk)
+        sys.stdout.buffer.flush()
+    else:
+        with open(args.output, 'wb') as file:
+            file.writelines(chunks)
+
+
+if __name__ == '__main__':
+    main()
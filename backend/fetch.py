@@ -0,0 +1,233 @@
+import contextlib
+import dataclasses
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    TypeVar,
+)
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .httpcache import HTTPCache
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_PER_HOST = 8
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+RETRY_EXCEPTIONS = (
+    requests.ConnectionError,
+    requests.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+)
+
+T = TypeVar('T')
+
+
+class ResponseError(ValueError):
+    def __init__(
+        self,
+        message: str,
+        status_code: int,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+def check_response(response: requests.Response) -> None:
+    if response.status_code == 200:
+        return
+    header = response.headers.get('Retry-After', '')
+    raise ResponseError(
+        f'Response unsuccessful with status code {response.status_code}',
+        response.status_code,
+        float(header) if header.isdigit() else None,
+    )
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = max(1.0, rate if burst is None else burst)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity,
+                    self.tokens + (now - self.updated) * self.rate,
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+@dataclasses.dataclass
+class RetryPolicy:
+    attempts: int = 4
+    base_delay: float = 0.5
+    max_delay: float = 30.0
+    statuses: FrozenSet[int] = RETRY_STATUSES
+
+    def delay(self, attempt: int, error: Exception) -> Optional[float]:
+        if attempt + 1 >= self.attempts:
+            return None
+        if isinstance(error, ResponseError):
+            if error.status_code not in self.statuses:
+                return None
+            if error.retry_after is not None:
+                return min(self.max_delay, error.retry_after)
+        elif not isinstance(error, RETRY_EXCEPTIONS):
+            return None
+        return random.uniform(
+            0, min(self.max_delay, self.base_delay * 2**attempt)
+        )
+
+
+class Throttle:
+    def __init__(
+        self,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        per_host: Optional[int] = DEFAULT_PER_HOST,
+    ) -> None:
+        self.bucket = None if rate is None else TokenBucket(rate, burst)
+        self.per_host = per_host
+        self.hosts: Dict[str, threading.BoundedSemaphore] = {}
+        self.lock = threading.Lock()
+
+    def semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self.lock:
+            if host not in self.hosts:
+                self.hosts[host] = threading.BoundedSemaphore(self.per_host)
+            return self.hosts[host]
+
+    @contextlib.contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        if self.per_host is None:
+            if self.bucket is not None:
+                self.bucket.acquire()
+            yield
+            return
+        with self.semaphore(urlsplit(url).netloc):
+            if self.bucket is not None:
+                self.bucket.acquire()
+            yield
+
+
+class ThrottledAdapter(HTTPAdapter):
+    def __init__(
+        self,
+        throttle: Throttle,
+        cache: Optional[HTTPCache] = None,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.throttle = throttle
+        self.cache = cache
+
+    def throttled_send(
+        self, request: requests.PreparedRequest, *args: Any, **kwargs: Any
+    ) -> requests.Response:
+        with self.throttle.slot(request.url or ''):
+            return super().send(request, *args, **kwargs)
+
+    def send(
+        self, request: requests.PreparedRequest, *args: Any, **kwargs: Any
+    ) -> requests.Response:
+        if self.cache is None:
+            return self.throttled_send(request, *args, **kwargs)
+        return self.cache.send(
+            request,
+            lambda request: self.throttled_send(request, *args, **kwargs),
+        )
+
+
+class Fetcher:
+    def __init__(
+        self,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        per_host: Optional[int] = DEFAULT_PER_HOST,
+        retry: Optional[RetryPolicy] = None,
+        cache: Optional[HTTPCache] = None,
+    ) -> None:
+        self.concurrency = concurrency
+        self.throttle = Throttle(rate, burst, per_host)
+        self.cache = cache
+        self.retry = RetryPolicy() if retry is None else retry
+        self.retries = 0
+        self.executor = ThreadPoolExecutor(concurrency)
+        self.local = threading.local()
+        self.sessions: List[requests.Session] = []
+        self.lock = threading.Lock()
+
+    @property
+    def session(self) -> requests.Session:
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            adapter = ThrottledAdapter(self.throttle, self.cache)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.local.session = session
+            with self.lock:
+                self.sessions.append(session)
+        return session
+
+    def call(self, func: Callable[..., T], args: Sequence[Any]) -> T:
+        attempt = 0
+        while True:
+            try:
+                return func(*args, session=self.session)
+            except Exception as error:
+                delay = self.retry.delay(attempt, error)
+                if delay is None:
+                    raise
+            with self.lock:
+                self.retries += 1
+            attempt += 1
+            time.sleep(delay)
+
+    def submit(self, func: Callable[..., T], *args: Any) -> 'Future[T]':
+        return self.executor.submit(self.call, func, args)
+
+    def starmap(
+        self, func: Callable[..., T], args_list: Iterable[Sequence[Any]]
+    ) -> List[T]:
+        futures = [self.submit(func, *args) for args in args_list]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        self.executor.shutdown()
+        with self.lock:
+            for session in self.sessions:
+                session.close()
+            self.sessions.clear()
+
+    def __enter__(self) -> 'Fetcher':
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
@@ -0,0 +1,291 @@
+import argparse
+import dataclasses
+import datetime
+import json
+import os
+import sqlite3
+import sys
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .data import DATA_DIR
+
+HISTORY_FILE = 'prices.sqlite3'
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS skus (
+    skuid TEXT PRIMARY KEY,
+    product_id TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    material TEXT NOT NULL,
+    shape TEXT NOT NULL,
+    size TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS skus_product ON skus (product_id, length);
+CREATE TABLE IF NOT EXISTS runs (
+    skuid TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    end INTEGER NOT NULL,
+    cents INTEGER NOT NULL,
+    observations INTEGER NOT NULL,
+    PRIMARY KEY (skuid, start)
+) WITHOUT ROWID;
+'''
+MOVERS_LIMIT = 20
+
+
+@dataclasses.dataclass
+class PriceObservation:
+    skuid: str
+    product_id: str
+    length: int
+    material: str
+    shape: str
+    size: str
+    price: float
+    fetched_at: float
+
+
+@dataclasses.dataclass
+class PriceRun:
+    start: float
+    end: float
+    price: float
+    observations: int
+
+
+@dataclasses.dataclass
+class PriceMove:
+    skuid: str
+    product_id: str
+    length: int
+    material: str
+    shape: str
+    size: str
+    old_price: float
+    new_price: float
+    change: float
+    percent: float
+
+
+def parse_time(text: str) -> float:
+    try:
+        return float(text)
+    except ValueError:
+        pass
+    try:
+        moment = datetime.datetime.fromisoformat(text)
+    except ValueError:
+        raise ValueError(
+            f'Invalid time {text!r}, expected an ISO date or a Unix timestamp'
+        ) from None
+    return moment.timestamp()
+
+
+class PriceHistory:
+    def __init__(self, file_path: str, readonly: bool = False) -> None:
+        self.file_path = file_path
+        if readonly:
+            if not os.path.exists(file_path):
+                raise FileNotFoundError(
+                    f'Price history not found at {file_path}'
+                )
+            self.connection = sqlite3.connect(
+                f'file:{file_path}?mode=ro', uri=True
+            )
+        else:
+            self.connection = sqlite3.connect(file_path)
+            self.connection.executescript(SCHEMA)
+
+    @classmethod
+    def open(cls, path: str, readonly: bool = False) -> 'PriceHistory':
+        return cls(os.path.join(path, HISTORY_FILE), readonly)
+
+    def record(
+        self, observations: Iterable[PriceObservation]
+    ) -> Tuple[int, int]:
+        extended = inserted = 0
+        with self.connection:
+            cursor = self.connection.cursor()
+            for observation in observations:
+                skuid = observation.skuid
+                cents = round(observation.price * 100)
+                moment = int(observation.fetched_at)
+                cursor.execute(
+                    'INSERT OR REPLACE INTO skus VALUES (?, ?, ?, ?, ?, ?)',
+                    (
+                        skuid,
+                        observation.product_id,
+                        observation.length,
+                        observation.material,
+                        observation.shape,
+                        observation.size,
+                    ),
+                )
+                latest = cursor.execute(
+                    'SELECT start, end, cents FROM runs WHERE skuid = ? '
+                    'ORDER BY start DESC LIMIT 1',
+                    (skuid,),
+                ).fetchone()
+                if latest is not None and moment <= latest[1]:
+                    continue
+                if latest is not None and latest[2] == cents:
+                    cursor.execute(
+                        'UPDATE runs SET end = ?, '
+                        'observations = observations + 1 '
+                        'WHERE skuid = ? AND start = ?',
+                        (moment, skuid, latest[0]),
+                    )
+                    extended += 1
+                else:
+                    cursor.execute(
+                        'INSERT INTO runs VALUES (?, ?, ?, ?, 1)',
+                        (skuid, moment, moment, cents),
+                    )
+                    inserted += 1
+        return extended, inserted
+
+    def skuid(self, product_id: str, length: int) -> Optional[str]:
+        row = self.connection.execute(
+            'SELECT skuid FROM skus WHERE product_id = ? AND length = ?',
+            (product_id, length),
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def history(
+        self,
+        skuid: str,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+    ) -> List[PriceRun]:
+        conditions = ['skuid = ?']
+        parameters: List[Any] = [skuid]
+        if since is not None:
+            conditions.append('end >= ?')
+            parameters.append(since)
+        if until is not None:
+            conditions.append('start <= ?')
+            parameters.append(until)
+        rows = self.connection.execute(
+            'SELECT start, end, cents, observations FROM runs '
+            f'WHERE {" AND ".join(conditions)} ORDER BY start',
+            parameters,
+        )
+        return [
+            PriceRun(start, end, cents / 100, observations)
+            for start, end, cents, observations in rows
+        ]
+
+    def movers(
+        self,
+        since: float,
+        limit: int = MOVERS_LIMIT,
+        materials: Optional[List[str]] = None,
+        shapes: Optional[List[str]] = None,
+    ) -> List[PriceMove]:
+        conditions = []
+        parameters: List[Any] = [since]
+        for column, values in (('material', materials), ('shape', shapes)):
+            if values is not None:
+                conditions.append(
+                    f'{column} IN ({", ".join("?" * len(values))})'
+                )
+                parameters.extend(values)
+        where = ' AND '.join(conditions) or '1'
+        rows = self.connection.execute(
+            f'''
+            SELECT * FROM (
+                SELECT skus.*,
+                    (SELECT cents FROM runs WHERE runs.skuid = skus.skuid
+                        AND start <= ? ORDER BY start DESC LIMIT 1) AS old,
+                    (SELECT cents FROM runs WHERE runs.skuid = skus.skuid
+                        ORDER BY start DESC LIMIT 1) AS new
+                FROM skus WHERE {where}
+            )
+            WHERE old IS NOT NULL AND old > 0 AND new != old
+            ORDER BY abs(new - old) * 1.0 / old DESC, skuid
+            LIMIT ?
+            ''',
+            parameters + [limit],
+        )
+        return [
+            PriceMove(
+                skuid,
+                product_id,
+                length,
+                material,
+                shape,
+                size,
+                old / 100,
+                new / 100,
+                round((new - old) / 100, 2),
+                round((new - old) / old * 100, 2),
+            )
+            for skuid, product_id, length, material, shape, size, old, new in (
+                rows
+            )
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        skus, runs, observations = self.connection.execute(
+            'SELECT (SELECT count(*) FROM skus), count(*), '
+            'coalesce(sum(observations), 0) FROM runs'
+        ).fetchone()
+        return {
+            'skus': skus,
+            'runs': runs,
+            'observations': observations,
+            'bytes': os.path.getsize(self.file_path),
+        }
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> 'PriceHistory':
+        return self
+
+    def __exit__(self, *_: Any) -> None:
+        self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Query the price history.')
+    parser.add_argument('--data', default=None)
+    parser.add_argument('--sku', help='show the price history of one SKU')
+    parser.add_argument('--product', help='product id, with --length')
+    parser.add_argument('--length', type=int)
+    parser.add_argument('--since', help='ISO date or Unix timestamp')
+    parser.add_argument('--until', help='ISO date or Unix timestamp')
+    parser.add_argument(
+        '--movers',
+        action='store_true',
+        help='list the largest price changes since --since',
+    )
+    parser.add_argument('--limit', type=int, default=MOVERS_LIMIT)
+    args = parser.parse_args()
+
+    path = args.data
+    if path is None:
+        path = os.path.join(os.path.expanduser('~'), DATA_DIR)
+    since = None if args.since is None else parse_time(args.since)
+    until = None if args.until is None else parse_time(args.until)
+    with PriceHistory.open(path, readonly=True) as history:
+        if args.movers:
+            if since is None:
+                parser.error('--movers requires --since')
+            results: List[Any] = history.movers(since, args.limit)
+        elif args.sku is not None or args.product is not None:
+            skuid = args.sku
+            if skuid is None:
+                skuid = history.skuid(args.product, args.length)
+                if skuid is None:
+                    parser.error('Unknown product and length')
+            results = history.history(skuid, since, until)
+        else:
+            results = [history.stats()]
+    for result in results:
+        if dataclasses.is_dataclass(result):
+            result = dataclasses.asdict(result)
+        sys.stdout.write(json.dumps(result) + '\n')
+
+
+if __name__ == '__main__':
+    main()
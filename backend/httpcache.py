@@ -0,0 +1,201 @@
+import hashlib
+import io
+import json
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+CACHE_DIR = os.path.join(
+    os.environ.get('XDG_CACHE_HOME', os.path.join('~', '.cache')),
+    'metalscrape',
+    'http',
+)
+MAX_BYTES = 512 * 2**20
+PAGE_TTL = 0.0
+PRICE_TTL = 6 * 60 * 60
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified')
+HEADER = struct.Struct('<I')
+
+Metadata = Dict[str, Any]
+
+
+class CacheMiss(requests.RequestException):
+    pass
+
+
+def cached_response(
+    request: requests.PreparedRequest, metadata: Metadata, body: bytes
+) -> requests.Response:
+    response = requests.Response()
+    response.status_code = metadata['status']
+    response.reason = 'OK'
+    response.headers = CaseInsensitiveDict(metadata['headers'])
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.raw = io.BytesIO(body)
+    response.url = request.url or metadata['url']
+    response.request = request
+    return response
+
+
+class HTTPCache:
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_bytes: int = MAX_BYTES,
+        page_ttl: float = PAGE_TTL,
+        price_ttl: float = PRICE_TTL,
+        offline: bool = False,
+    ) -> None:
+        self.path = os.path.expanduser(CACHE_DIR if path is None else path)
+        self.max_bytes = max_bytes
+        self.page_ttl = page_ttl
+        self.price_ttl = price_ttl
+        self.offline = offline
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        entries = sorted(
+            (
+                entry
+                for entry in os.scandir(self.path)
+                if entry.is_file() and not entry.name.endswith('.tmp')
+            ),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        self.index: 'OrderedDict[str, int]' = OrderedDict(
+            (entry.name, entry.stat().st_size) for entry in entries
+        )
+        self.nbytes = sum(self.index.values())
+
+    def key(self, request: requests.PreparedRequest) -> str:
+        body = request.body or b''
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        digest = hashlib.sha256()
+        digest.update(f'{request.method} {request.url}\n'.encode('utf-8'))
+        digest.update(body)
+        return digest.hexdigest()
+
+    def ttl(self, request: requests.PreparedRequest) -> float:
+        return self.page_ttl if request.method == 'GET' else self.price_ttl
+
+    def get(self, key: str) -> Optional[Tuple[Metadata, bytes]]:
+        file_path = os.path.join(self.path, key)
+        try:
+            with open(file_path, 'rb') as file:
+                (length,) = HEADER.unpack(file.read(HEADER.size))
+                metadata = json.loads(file.read(length))
+                body = file.read()
+        except (FileNotFoundError, struct.error, ValueError):
+            return None
+        with self.lock:
+            if key in self.index:
+                self.index.move_to_end(key)
+        os.utime(file_path)
+        return metadata, body
+
+    def put(self, key: str, metadata: Metadata, body: bytes) -> None:
+        header = json.dumps(metadata).encode('utf-8')
+        data = HEADER.pack(len(header)) + header + body
+        if len(data) > self.max_bytes:
+            return
+        file_path = os.path.join(self.path, key)
+        temp_path = f'{file_path}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, file_path)
+        with self.lock:
+            self.nbytes += len(data) - self.index.pop(key, 0)
+            self.index[key] = len(data)
+            while self.nbytes > self.max_bytes:
+                evicted, size = self.index.popitem(last=False)
+                self.nbytes -= size
+                self.evictions += 1
+                try:
+                    os.remove(os.path.join(self.path, evicted))
+                except FileNotFoundError:
+                    pass
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        send: Callable[[requests.PreparedRequest], requests.Response],
+    ) -> requests.Response:
+        key = self.key(request)
+        cached = self.get(key)
+        now = time.time()
+        if cached is not None:
+            metadata, body = cached
+            fresh = now - metadata['stored_at'] <= self.ttl(request)
+            if self.offline or fresh:
+                with self.lock:
+                    self.hits += 1
+                return cached_response(request, metadata, body)
+            headers = metadata['headers']
+            if request.method == 'GET' and 'ETag' in headers:
+                request.headers['If-None-Match'] = headers['ETag']
+            if request.method == 'GET' and 'Last-Modified' in headers:
+                request.headers['If-Modified-Since'] = headers['Last-Modified']
+        elif self.offline:
+            with self.lock:
+                self.misses += 1
+            raise CacheMiss(
+                f'{request.method} {request.url} is not cached',
+                request=request,
+            )
+
+        response = send(request)
+        if response.status_code == 304 and cached is not None:
+            response.close()
+            metadata, body = cached
+            metadata['stored_at'] = now
+            self.put(key, metadata, body)
+            with self.lock:
+                self.revalidated += 1
+            return cached_response(request, metadata, body)
+        with self.lock:
+            self.misses += 1
+        if response.status_code == 200:
+            metadata = {
+                'url': request.url,
+                'status': response.status_code,
+                'headers': {
+                    name: response.headers[name]
+                    for name in STORED_HEADERS
+                    if name in response.headers
+                },
+                'stored_at': now,
+            }
+            self.put(key, metadata, response.content)
+        return response
+
+    def clear(self) -> None:
+        with self.lock:
+            for key in self.index:
+                try:
+                    os.remove(os.path.join(self.path, key))
+                except FileNotFoundError:
+                    pass
+            self.index.clear()
+            self.nbytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'entries': len(self.index),
+            'bytes': self.nbytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'revalidated': self.revalidated,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,266 @@
+import bisect
+import collections
+import contextlib
+import os
+import sys
+import threading
+import time
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+)
+
+LATENCY_BUCKETS = (
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+PROFILE_INTERVAL = 0.001
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(
+        '%s="%s"' % (name, value.replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in labels
+    )
+    return '{' + pairs + '}'
+
+
+class Metric:
+    kind = 'untyped'
+
+    def __init__(self, name: str, description: str) -> None:
+        self.name = name
+        self.description = description
+        self.lock = threading.Lock()
+
+    def samples(self, constant: Labels = ()) -> List[str]:
+        raise NotImplementedError
+
+    def render(self, constant: Labels = ()) -> str:
+        lines = [
+            f'# HELP {self.name} {self.description}',
+            f'# TYPE {self.name} {self.kind}',
+            *self.samples(constant),
+        ]
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def __init__(self, name: str, description: str) -> None:
+        super().__init__(name, description)
+        self.values: Dict[Labels, float] = collections.defaultdict(float)
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] += amount
+
+    def samples(self, constant: Labels = ()) -> List[str]:
+        with self.lock:
+            return [
+                f'{self.name}{format_labels(constant + labels)} {value}'
+                for labels, value in sorted(self.values.items())
+            ]
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        collect: Callable[[], Dict[Labels, float]],
+    ) -> None:
+        super().__init__(name, description)
+        self.collect = collect
+
+    def samples(self, constant: Labels = ()) -> List[str]:
+        return [
+            f'{self.name}{format_labels(constant + labels)} {value}'
+            for labels, value in sorted(self.collect().items())
+        ]
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, description)
+        self.buckets = tuple(buckets)
+        self.counts: Dict[Labels, List[int]] = {}
+        self.sums: Dict[Labels, float] = collections.defaultdict(float)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        bucket = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            if key not in self.counts:
+                self.counts[key] = [0] * (len(self.buckets) + 1)
+            self.counts[key][bucket] += 1
+            self.sums[key] += value
+
+    @contextlib.contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self, constant: Labels = ()) -> List[str]:
+        lines = []
+        with self.lock:
+            for key, counts in sorted(self.counts.items()):
+                labels = constant + key
+                cumulative = 0
+                bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+                for bound, count in zip(bounds, counts):
+                    cumulative += count
+                    bucket_labels = format_labels(labels + (('le', bound),))
+                    lines.append(
+                        f'{self.name}_bucket{bucket_labels} {cumulative}'
+                    )
+                lines.append(
+                    f'{self.name}_sum{format_labels(labels)} '
+                    f'{self.sums[key]}'
+                )
+                lines.append(
+                    f'{self.name}_count{format_labels(labels)} {cumulative}'
+                )
+        return lines
+
+
+M = TypeVar('M', bound=Metric)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: Dict[str, Metric] = {}
+
+    def register(self, metric: M) -> M:
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        constant = (('worker', str(os.getpid())),)
+        return (
+            '\n'.join(
+                metric.render(constant) for metric in self.metrics.values()
+            )
+            + '\n'
+        )
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.register(
+    Histogram('metalscrape_request_seconds', 'Request latency by endpoint.')
+)
+REQUESTS = registry.register(
+    Counter('metalscrape_requests_total', 'Requests by endpoint and status.')
+)
+STAGE_SECONDS = registry.register(
+    Histogram(
+        'metalscrape_search_stage_seconds',
+        'Time spent in each stage of a search.',
+    )
+)
+ROWS_SCANNED = registry.register(
+    Counter(
+        'metalscrape_rows_scanned_total',
+        'Catalog rows examined by filters.',
+    )
+)
+ROWS_RETURNED = registry.register(
+    Counter('metalscrape_rows_returned_total', 'Rows returned to clients.')
+)
+SORT_CACHE = registry.register(
+    Counter(
+        'metalscrape_sort_cache_total',
+        'Sort order lookups by result (hit or miss).',
+    )
+)
+
+
+class SamplingProfiler:
+    def __init__(
+        self,
+        thread_id: Optional[int] = None,
+        interval: float = PROFILE_INTERVAL,
+    ) -> None:
+        self.thread_id = (
+            threading.get_ident() if thread_id is None else thread_id
+        )
+        self.interval = interval
+        self.stacks: Dict[str, int] = collections.Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(
+                    f'{code.co_name} ({os.path.basename(code.co_filename)}'
+                    f':{code.co_firstlineno})'
+                )
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(names))] += 1
+            self.samples += 1
+
+    def start(self) -> 'SamplingProfiler':
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+    def collapsed(self) -> str:
+        return ''.join(
+            f'{stack} {count}\n'
+            for stack, count in sorted(
+                self.stacks.items(), key=lambda item: -item[1]
+            )
+        )
+
+    def __enter__(self) -> 'SamplingProfiler':
+        return self.start()
+
+    def __exit__(self, *_: object) -> None:
+        self.stop()
@@ -0,0 +1,303 @@
+import codecs
+import dataclasses
+import re
+from functools import partial
+from html.parser import HTMLParser
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import bs4
+from bs4.dammit import EncodingDetector
+
+try:
+    import lxml
+except ImportError:
+    lxml = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+PRODUCT_ROW = 'product-row'
+PRODUCT_SIZE = 'product-size'
+PRODUCT_BASE_WEIGHT = 'product-base-weight'
+LENGTH_SELECT = 'length-select'
+PRODUCT_ROW_CLASS = re.compile(rf'(^|\s){PRODUCT_ROW}(\s|$)')
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclasses.dataclass
+class ProductRow:
+    index: int
+    product_id: Optional[str]
+    size_strings: Tuple[str, ...] = ()
+    base_weight_text: Optional[str] = None
+    length_options: List[Tuple[Optional[str], str]] = dataclasses.field(
+        default_factory=list
+    )
+
+
+RowParser = Callable[[Iterable[bytes]], Iterator[ProductRow]]
+
+
+def soup_row(index: int, tag: bs4.element.Tag) -> ProductRow:
+    size = tag.find('div', class_=PRODUCT_SIZE)
+    base_weight = tag.find('div', class_=PRODUCT_BASE_WEIGHT)
+    length_select = tag.find('select', class_=LENGTH_SELECT)
+    return ProductRow(
+        index,
+        tag.get('data-product-id'),
+        () if size is None else tuple(size.stripped_strings),
+        None if base_weight is None else base_weight.text,
+        (
+            []
+            if length_select is None
+            else [
+                (option.get('data-skuid'), option.text)
+                for option in length_select.find_all('option')
+            ]
+        ),
+    )
+
+
+def soup_rows(
+    chunks: Iterable[bytes], features: str, strain: bool = True
+) -> Iterator[ProductRow]:
+    strainer = (
+        bs4.SoupStrainer('div', class_=PRODUCT_ROW_CLASS) if strain else None
+    )
+    site = bs4.BeautifulSoup(b''.join(chunks), features, parse_only=strainer)
+    for index, tag in enumerate(site.find_all('div', class_=PRODUCT_ROW), 1):
+        yield soup_row(index, tag)
+
+
+def selectolax_rows(chunks: Iterable[bytes]) -> Iterator[ProductRow]:
+    tree = LexborHTMLParser(b''.join(chunks))
+    for index, node in enumerate(tree.css(f'div.{PRODUCT_ROW}'), 1):
+        size = node.css_first(f'div.{PRODUCT_SIZE}')
+        base_weight = node.css_first(f'div.{PRODUCT_BASE_WEIGHT}')
+        length_select = node.css_first(f'select.{LENGTH_SELECT}')
+        size_strings = (
+            ()
+            if size is None
+            else tuple(
+                text
+                for child in size.traverse(include_text=True)
+                if child.tag == '-text'
+                for text in (child.text_content.strip(),)
+                if text
+            )
+        )
+        yield ProductRow(
+            index,
+            node.attributes.get('data-product-id'),
+            size_strings,
+            None if base_weight is None else base_weight.text(),
+            (
+                []
+                if length_select is None
+                else [
+                    (option.attributes.get('data-skuid'), option.text())
+                    for option in length_select.css('option')
+                ]
+            ),
+        )
+
+
+class RowState:
+    def __init__(self, row: ProductRow, depth: int) -> None:
+        self.row = row
+        self.depth = depth
+        self.field: Optional[str] = None
+        self.field_depth = 0
+        self.seen: List[str] = []
+        self.text: List[str] = []
+        self.strings: List[str] = []
+        self.in_select = False
+        self.option: Optional[Tuple[Optional[str], List[str]]] = None
+
+    def flush_string(self) -> None:
+        if self.field == PRODUCT_SIZE and self.text:
+            text = ''.join(self.text).strip()
+            if text:
+                self.strings.append(text)
+            self.text = []
+
+    def close_option(self) -> None:
+        if self.option is not None:
+            skuid, text = self.option
+            self.row.length_options.append((skuid, ''.join(text)))
+        self.option = None
+
+    def close_field(self) -> None:
+        if self.field is None:
+            return
+        self.flush_string()
+        if self.field == PRODUCT_SIZE:
+            self.row.size_strings = tuple(self.strings)
+        else:
+            self.row.base_weight_text = ''.join(self.text)
+        self.field = None
+        self.text = []
+        self.strings = []
+
+    def close(self) -> ProductRow:
+        self.close_option()
+        self.close_field()
+        self.in_select = False
+        return self.row
+
+    def start(
+        self,
+        tag: str,
+        attributes: Dict[str, Optional[str]],
+        classes: List[str],
+        depth: int,
+    ) -> None:
+        if tag == 'div':
+            if self.field is not None:
+                return
+            for field in (PRODUCT_SIZE, PRODUCT_BASE_WEIGHT):
+                if field in classes and field not in self.seen:
+                    self.seen.append(field)
+                    self.field = field
+                    self.field_depth = depth
+                    return
+        elif tag == 'select':
+            if LENGTH_SELECT in classes and LENGTH_SELECT not in self.seen:
+                self.seen.append(LENGTH_SELECT)
+                self.in_select = True
+        elif tag == 'option' and self.in_select:
+            self.close_option()
+            self.option = (attributes.get('data-skuid'), [])
+
+    def end(self, tag: str, depth: int) -> bool:
+        if tag == 'option':
+            self.close_option()
+        elif tag == 'select' and self.in_select:
+            self.close_option()
+            self.in_select = False
+        elif tag == 'div':
+            if self.field is not None and depth == self.field_depth:
+                self.close_field()
+            return depth == self.depth
+        return False
+
+    def data(self, data: str) -> None:
+        if self.option is not None:
+            self.option[1].append(data)
+        if self.field is not None:
+            self.text.append(data)
+
+
+class StreamingRowParser(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__()
+        self.rows: List[ProductRow] = []
+        self.count = 0
+        self.depth = 0
+        self.open: List[RowState] = []
+        self.closed: List[ProductRow] = []
+
+    def flush_string(self) -> None:
+        for state in self.open:
+            if state.text:
+                state.flush_string()
+
+    def finish_rows(self) -> None:
+        if not self.open:
+            self.closed.sort(key=lambda row: row.index)
+            self.rows.extend(self.closed)
+            self.closed = []
+
+    def handle_starttag(
+        self, tag: str, attrs: List[Tuple[str, Optional[str]]]
+    ) -> None:
+        self.flush_string()
+        attributes = dict(attrs)
+        classes = (attributes.get('class') or '').split()
+        if tag == 'div':
+            self.depth += 1
+        for state in self.open:
+            state.start(tag, attributes, classes, self.depth)
+        if tag == 'div' and PRODUCT_ROW in classes:
+            self.count += 1
+            row = ProductRow(self.count, attributes.get('data-product-id'))
+            self.open.append(RowState(row, self.depth))
+
+    def handle_endtag(self, tag: str) -> None:
+        self.flush_string()
+        if tag == 'div' and self.depth == 0:
+            return
+        closed = False
+        for state in self.open:
+            closed = state.end(tag, self.depth)
+        if tag == 'div':
+            self.depth -= 1
+        if closed:
+            self.closed.append(self.open.pop().close())
+            self.finish_rows()
+
+    def handle_comment(self, data: str) -> None:
+        self.flush_string()
+
+    def handle_data(self, data: str) -> None:
+        for state in self.open:
+            state.data(data)
+
+    def close(self) -> None:
+        super().close()
+        self.flush_string()
+        self.closed.extend(state.close() for state in self.open)
+        self.open = []
+        self.finish_rows()
+
+    def drain(self) -> List[ProductRow]:
+        rows, self.rows = self.rows, []
+        return rows
+
+
+def streaming_rows(chunks: Iterable[bytes]) -> Iterator[ProductRow]:
+    parser = StreamingRowParser()
+    decoder = None
+    for chunk in chunks:
+        if decoder is None:
+            encoding = EncodingDetector.find_declared_encoding(
+                chunk, is_html=True
+            )
+            decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(
+                'replace'
+            )
+        parser.feed(decoder.decode(chunk))
+        yield from parser.drain()
+    if decoder is not None:
+        parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    yield from parser.drain()
+
+
+PARSERS: Dict[str, Optional[RowParser]] = {
+    'selectolax': None if LexborHTMLParser is None else selectolax_rows,
+    'stream': streaming_rows,
+    'lxml': None if lxml is None else partial(soup_rows, features='lxml'),
+    'html.parser': partial(soup_rows, features='html.parser'),
+    'html5lib': partial(soup_rows, features='html5lib', strain=False),
+}
+
+
+def available_parsers() -> List[str]:
+    return [name for name, parser in PARSERS.items() if parser is not None]
+
+
+DEFAULT_PARSER = available_parsers()[0]
+
+
+def get_parser(name: str) -> RowParser:
+    if name not in PARSERS:
+        raise ValueError(
+            f'Unknown parser {name}, expected one of {list(PARSERS)}'
+        )
+    parser = PARSERS[name]
+    if parser is None:
+        raise ValueError(f'Parser {name} is not installed')
+    return parser
@@ -1,31 +1,176 @@
+import argparse
+import gc
+import hashlib
+import hmac
 import json
+import mimetypes
+import os
+import select
+import signal
+import socket
+import threading
+import time
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 
 import flask
+from werkzeug.security import safe_join
+from werkzeug.serving import make_server
 
-from .app import DataclassEncoder, SpecificProduct, SpecificProducts, load_all
+from .app import (
+    DATA_DIR,
+    SpecificProducts,
+    encode_json,
+    load_catalog,
+    parse_filters,
+)
+from .catalog import parse_sort
+from .cutlist import DEFAULT_KERF, parse_cuts
 from .data import materials, shapes
+from .export import EXPORT_FORMATS, export, parse_columns
+from .history import MOVERS_LIMIT, PriceHistory, parse_time
+from .metrics import (
+    REQUEST_SECONDS,
+    REQUESTS,
+    Gauge,
+    Labels,
+    SamplingProfiler,
+    registry,
+)
 
 app = flask.Flask(__name__)
 
+Signature = Tuple[Tuple[str, int, int], ...]
+
 
 @dataclass
 class Global:
     specific_products: Optional[SpecificProducts]
+    path: Optional[str] = None
+    signature: Signature = ()
+    master: Optional[int] = None
 
 
 g = Global(None)
+reload_lock = threading.Lock()
+
+PAGE_SIZE = 20
+WATCH_INTERVAL = 30.0
+STATIC_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', 'client', 'public'
+)
+STATIC_MAX_AGE = 3600
+
+
+@dataclass
+class StaticFile:
+    content: bytes
+    etag: str
+    mimetype: str
+    mtime_ns: int
+
+
+static_files: Dict[str, StaticFile] = {}
+
+
+def static_response(path: str) -> flask.Response:
+    file_path = safe_join(STATIC_DIR, path)
+    if file_path is None or not os.path.isfile(file_path):
+        flask.abort(404)
+    mtime_ns = os.stat(file_path).st_mtime_ns
+    static_file = static_files.get(file_path)
+    if static_file is None or static_file.mtime_ns != mtime_ns:
+        with open(file_path, 'rb') as file:
+            content = file.read()
+        mimetype = mimetypes.guess_type(file_path)[0]
+        static_file = StaticFile(
+            content,
+            hashlib.sha1(content).hexdigest(),
+            mimetype or 'application/octet-stream',
+            mtime_ns,
+        )
+        static_files[file_path] = static_file
+
+    response = flask.Response(
+        static_file.content, mimetype=static_file.mimetype
+    )
+    response.set_etag(static_file.etag)
+    if path.endswith('.html'):
+        response.cache_control.no_cache = True
+    else:
+        response.cache_control.public = True
+        response.cache_control.max_age = STATIC_MAX_AGE
+    return response.make_conditional(flask.request)
+
+
+def authorized() -> bool:
+    token = os.environ.get('METALSCRAPE_ADMIN_TOKEN')
+    if not token:
+        return False
+    supplied = flask.request.headers.get('X-Admin-Token', '')
+    return hmac.compare_digest(supplied.encode(), token.encode())
+
+
+def catalog_gauges() -> Dict[Labels, float]:
+    specific_products = g.specific_products
+    if specific_products is None:
+        return {}
+    gauges: Dict[Labels, float] = {
+        (('metric', 'catalog_rows'),): len(specific_products.specific_products)
+    }
+    for name, value in specific_products.result_cache.stats().items():
+        gauges[(('metric', f'result_cache_{name}'),)] = value
+    return gauges
+
+
+registry.register(
+    Gauge(
+        'metalscrape_catalog',
+        'Catalog size and result cache statistics.',
+        catalog_gauges,
+    )
+)
+
+
+@app.before_request
+def before_request():
+    flask.g.start = time.perf_counter()
+    flask.g.profiler = None
+    if flask.request.args.get('profile'):
+        if not authorized():
+            flask.abort(403)
+        flask.g.profiler = SamplingProfiler().start()
+
+
+@app.after_request
+def after_request(response):
+    endpoint = flask.request.endpoint or 'unknown'
+    REQUEST_SECONDS.observe(
+        time.perf_counter() - flask.g.start, endpoint=endpoint
+    )
+    REQUESTS.inc(endpoint=endpoint, status=str(response.status_code))
+    profiler = flask.g.profiler
+    if profiler is None:
+        return response
+    profiler.stop()
+    return flask.Response(profiler.collapsed(), mimetype='text/plain')
+
+
+@app.route('/metrics')
+def api_metrics():
+    return flask.Response(
+        registry.render(), mimetype='text/plain; version=0.0.4'
+    )
 
 
 @app.route('/')
 def index():
-    return flask.send_from_directory('../client/public', 'index.html')
+    return static_response('index.html')
 
 
 @app.route('/<path:path>')
 def route(path):
-    return flask.send_from_directory('../client/public', path)
+    return static_response(path)
 
 
 @app.route('/products')
@@ -33,51 +178,152 @@ def api_specific_products():
     args = flask.request.args
     sort_by = args.get('sort', 'index')
     sort_dir = args.get('sortdir', 'ascending')
-    if (
-        sort_by not in SpecificProduct.__dataclass_fields__
-        or sort_dir not in ('ascending', 'descending')
-    ):
+    if sort_dir not in ('ascending', 'descending'):
+        return ''
+    try:
+        parse_sort(sort_by)
+    except ValueError:
         return ''
 
-    filters = {
-        'lengthLower': args.get('lengthLower', None),
-        'lengthUpper': args.get('lengthUpper', None),
-        'poundsPerFootLower': args.get('poundsPerFootLower', None),
-        'poundsPerFootUpper': args.get('poundsPerFootUpper', None),
-        'priceLower': args.get('priceLower', None),
-        'priceUpper': args.get('priceUpper', None),
-        'pricePerFootLower': args.get('pricePerFootLower', None),
-        'pricePerFootUpper': args.get('pricePerFootUpper', None),
-        'pricePerPoundLower': args.get('pricePerPoundLower', None),
-        'pricePerPoundUpper': args.get('pricePerPoundUpper', None),
-    }
-
-    filter_materials_string = args.get('materials')
-    if filter_materials_string is not None:
-        filter_materials = filter_materials_string.split(',')
-    else:
-        filter_materials = None
-    filter_shapes_string = args.get('shapes')
-    if filter_shapes_string is not None:
-        filter_shapes = filter_shapes_string.split(',')
-    else:
-        filter_shapes = None
+    filter_materials, filter_shapes, filters = parse_filters(args)
 
     ascending = sort_dir == 'ascending'
-    batch_index = int(args.get('page', 0))
-    sorted_specific_products = g.specific_products.search(
-        sort_by,
-        ascending,
-        filter_materials,
-        filter_shapes,
-        filters,
-        batch_index,
+    specific_products = g.specific_products
+    try:
+        cursor = int(args.get('cursor', 0))
+        batch_index = int(args.get('page', 0))
+        if cursor < 0 or batch_index < 0:
+            raise ValueError('cursor and page must not be negative')
+        page_json = specific_products.page_json(
+            sort_by,
+            ascending,
+            filter_materials,
+            filter_shapes,
+            filters,
+            cursor=cursor,
+            offset=batch_index * PAGE_SIZE,
+            limit=PAGE_SIZE,
+        )
+    except ValueError as error:
+        flask.abort(400, str(error))
+    return flask.Response(page_json, mimetype='application/json')
+
+
+@app.route('/export')
+def api_export():
+    args = flask.request.args
+    filter_materials, filter_shapes, filters = parse_filters(args)
+    export_format = args.get('format', 'ndjson')
+    sort_dir = args.get('sortdir', 'ascending')
+    if sort_dir not in ('ascending', 'descending'):
+        flask.abort(400, f'Unknown sort direction {sort_dir}')
+    try:
+        columns = parse_columns(args.get('columns'))
+        chunks = export(
+            g.specific_products,
+            export_format,
+            columns,
+            args.get('sort', 'index'),
+            sort_dir == 'ascending',
+            filter_materials,
+            filter_shapes,
+            filters,
+        )
+    except ValueError as error:
+        flask.abort(400, str(error))
+    response = flask.Response(chunks, mimetype=EXPORT_FORMATS[export_format])
+    response.headers['Content-Disposition'] = (
+        f'attachment; filename=products.{export_format}'
+    )
+    return response
+
+
+@app.route('/optimize')
+def api_optimize():
+    args = flask.request.args
+    missing = [
+        name
+        for name in ('material', 'shape', 'size', 'cuts')
+        if not args.get(name)
+    ]
+    if missing:
+        flask.abort(400, f'Missing parameters {missing}')
+    try:
+        plan = g.specific_products.optimize(
+            args['material'],
+            args['shape'],
+            args['size'],
+            parse_cuts(args['cuts']),
+            float(args.get('kerf', DEFAULT_KERF)),
+        )
+    except ValueError as error:
+        flask.abort(400, str(error))
+    return flask.Response(encode_json(plan), mimetype='application/json')
+
+
+def data_path() -> str:
+    return g.path or os.path.join(os.path.expanduser('~'), DATA_DIR)
+
+
+def price_history() -> PriceHistory:
+    try:
+        return PriceHistory.open(data_path(), readonly=True)
+    except FileNotFoundError as error:
+        flask.abort(404, str(error))
+
+
+@app.route('/history')
+def api_history():
+    args = flask.request.args
+    try:
+        since = parse_time(args['since']) if 'since' in args else None
+        until = parse_time(args['until']) if 'until' in args else None
+        length = int(args.get('length', 0))
+    except ValueError as error:
+        flask.abort(400, str(error))
+    with price_history() as history:
+        skuid = args.get('skuid')
+        if skuid is None and 'product_id' in args:
+            skuid = history.skuid(args['product_id'], length)
+        if skuid is None:
+            flask.abort(404, 'Unknown SKU')
+        runs = history.history(skuid, since, until)
+    return flask.Response(
+        encode_json({'skuid': skuid, 'runs': runs}),
+        mimetype='application/json',
     )
 
-    specific_products_json = json.dumps(
-        sorted_specific_products, cls=DataclassEncoder
+
+@app.route('/movers')
+def api_movers():
+    args = flask.request.args
+    filter_materials, filter_shapes, _ = parse_filters(args)
+    if 'since' not in args:
+        flask.abort(400, 'Missing parameter since')
+    try:
+        since = parse_time(args['since'])
+        limit = int(args.get('limit', MOVERS_LIMIT))
+    except ValueError as error:
+        flask.abort(400, str(error))
+    with price_history() as history:
+        movers = history.movers(since, limit, filter_materials, filter_shapes)
+    return flask.Response(encode_json(movers), mimetype='application/json')
+
+
+@app.route('/facets')
+def api_facets():
+    filter_materials, filter_shapes, filters = parse_filters(
+        flask.request.args
     )
-    return specific_products_json
+    specific_products = g.specific_products
+    try:
+        facets = specific_products.facets(
+            filter_materials, filter_shapes, filters
+        )
+    except ValueError as error:
+        flask.abort(400, str(error))
+    facets_json = json.dumps(facets)
+    return flask.Response(facets_json, mimetype='application/json')
 
 
 @app.route('/materials')
@@ -92,15 +338,234 @@ def api_shapes():
     return shapes_json
 
 
-def init() -> None:
-    product_bundles = load_all()
-    g.specific_products = SpecificProducts(product_bundles)
+@app.route('/stats')
+def api_stats():
+    specific_products = g.specific_products
+    stats = {
+        'catalog_size': len(specific_products.specific_products),
+        'result_cache': specific_products.result_cache.stats(),
+    }
+    stats_json = json.dumps(stats)
+    return stats_json
+
+
+@app.route('/admin/reload', methods=['POST'])
+def api_reload():
+    if not authorized():
+        flask.abort(403)
+    if g.master is not None:
+        os.kill(g.master, signal.SIGHUP)
+        reload_json = json.dumps({'restarting_workers': True})
+        return flask.Response(
+            reload_json, status=202, mimetype='application/json'
+        )
+    start = time.perf_counter()
+    specific_products = reload_catalog()
+    reload_json = json.dumps(
+        {
+            'catalog_size': len(specific_products.specific_products),
+            'seconds': time.perf_counter() - start,
+            'restarting_workers': False,
+        }
+    )
+    return flask.Response(reload_json, mimetype='application/json')
+
+
+def reload_catalog(path: Optional[str] = None) -> SpecificProducts:
+    with reload_lock:
+        signature = data_signature(data_path() if path is None else path)
+        specific_products = load_catalog(g.path if path is None else path)
+        g.specific_products = specific_products
+        g.signature = signature
+    return specific_products
+
+
+def data_signature(path: str) -> Signature:
+    if not os.path.isdir(path):
+        return ()
+    entries = []
+    for entry in os.scandir(path):
+        if entry.is_file():
+            stat = entry.stat()
+            entries.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(sorted(entries))
+
+
+class CatalogWatcher(threading.Thread):
+    def __init__(
+        self, path: Optional[str] = None, interval: float = WATCH_INTERVAL
+    ) -> None:
+        super().__init__(daemon=True)
+        self.path = data_path() if path is None else path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.seen = g.signature
+        self.pending: Optional[Signature] = None
+
+    def changed(self) -> bool:
+        current = data_signature(self.path)
+        if current == self.seen:
+            self.pending = None
+            return False
+        if current != self.pending:
+            self.pending = current
+            return False
+        self.seen = current
+        self.pending = None
+        return True
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            if not self.changed():
+                continue
+            try:
+                specific_products = reload_catalog(self.path)
+            except Exception as error:
+                print(f'Catalog reload failed: {error}')
+            else:
+                print(
+                    'Reloaded catalog with '
+                    f'{len(specific_products.specific_products)} products'
+                )
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+
+def init(path: Optional[str] = None) -> None:
+    g.path = path
+    reload_catalog()
+
+
+def run_worker(listener: socket.socket, host: str, port: int) -> None:
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGHUP, signal.SIG_DFL)
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    signal.set_wakeup_fd(-1)
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+    server.serve_forever()
+
+
+def fork_worker(listener: socket.socket, host: str, port: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(listener, host, port)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def serve(host: str, port: int, workers: int) -> None:
+    listener = socket.create_server((host, port), backlog=2048)
+    g.master = os.getpid()
+    gc.freeze()
+    children = {fork_worker(listener, host, port) for _ in range(workers)}
+    print(f'Serving on http://{host}:{port} with {workers} workers')
+
+    stopping = False
+    retiring: List[int] = []
+    watcher = CatalogWatcher()
+
+    def retire_next() -> None:
+        while retiring:
+            pid = retiring.pop()
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                continue
+            return
+
+    def roll() -> None:
+        try:
+            specific_products = reload_catalog()
+        except Exception as error:
+            print(f'Catalog reload failed: {error}')
+            return
+        watcher.seen = g.signature
+        watcher.pending = None
+        gc.freeze()
+        print(
+            'Reloaded catalog with '
+            f'{len(specific_products.specific_products)} products, '
+            'restarting workers'
+        )
+        retiring[:] = children
+        retire_next()
+
+    def stop() -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    wakeup, notify = os.pipe()
+    os.set_blocking(wakeup, False)
+    os.set_blocking(notify, False)
+    signal.set_wakeup_fd(notify)
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+        signal.signal(signum, lambda *_: None)
+    signal.signal(signal.SIGCHLD, lambda *_: None)
+    next_check = time.monotonic() + watcher.interval
+    while children:
+        timeout = max(0.0, next_check - time.monotonic())
+        if select.select([wakeup], [], [], timeout)[0]:
+            signals = set(os.read(wakeup, 1024))
+        else:
+            signals = set()
+        if signals & {signal.SIGINT, signal.SIGTERM} and not stopping:
+            stop()
+        while children:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                children.clear()
+                break
+            if pid == 0:
+                break
+            children.discard(pid)
+            if not stopping:
+                print(f'Worker {pid} exited, starting a replacement')
+                children.add(fork_worker(listener, host, port))
+                retire_next()
+        if stopping:
+            continue
+        reload = signal.SIGHUP in signals
+        if time.monotonic() >= next_check:
+            next_check = time.monotonic() + watcher.interval
+            reload = watcher.changed() or reload
+        if reload:
+            roll()
+    signal.set_wakeup_fd(-1)
+    os.close(wakeup)
+    os.close(notify)
+    listener.close()
 
 
 def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--data', default=None, help='catalog data directory')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=0,
+        help='fork this many workers sharing one preloaded catalog',
+    )
+    args = parser.parse_args()
+
     with app.app_context():
-        init()
-    app.run(debug=True, host='0.0.0.0')
+        init(args.data)
+    if args.workers > 0:
+        serve(args.host, args.port, args.workers)
+        return
+    CatalogWatcher().start()
+    app.run(debug=True, host=args.host, port=args.port)
 
 
 if __name__ == '__main__':
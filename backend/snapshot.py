@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+import struct
+from typing import Any, Dict
+
+import numpy as np
+
+from .catalog import ColumnarCatalog
+
+SNAPSHOT_FILE = 'catalog.snapshot'
+MAGIC = b'MSNAP001'
+ALIGNMENT = 64
+PREFIX = struct.Struct('<8sQ')
+
+
+def align(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(catalog: ColumnarCatalog, file_path: str) -> None:
+    arrays = {
+        **{('column', name): array for name, array in catalog.columns.items()},
+        **{('codes', name): array for name, array in catalog.codes.items()},
+    }
+    layout: Dict[str, Dict[str, Dict[str, Any]]] = {'column': {}, 'codes': {}}
+    offset = 0
+    for (kind, name), array in arrays.items():
+        offset = align(offset)
+        array = np.ascontiguousarray(array)
+        layout[kind][name] = {
+            'dtype': array.dtype.str,
+            'offset': offset,
+            'length': len(array),
+        }
+        offset += array.nbytes
+    header = json.dumps(
+        {
+            'size': catalog.size,
+            'layout': layout,
+            'categories': catalog.categories,
+        }
+    ).encode('utf-8')
+    data_start = align(PREFIX.size + len(header) + 32)
+    checksum = hashlib.sha256(header)
+
+    temp_path = file_path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(PREFIX.pack(MAGIC, len(header)))
+        file.write(header)
+        file.write(bytes(data_start - file.tell()))
+        for (kind, name), array in arrays.items():
+            position = data_start + layout[kind][name]['offset']
+            padding = position - file.tell()
+            file.write(bytes(padding))
+            checksum.update(bytes(padding))
+            data = np.ascontiguousarray(array).data
+            file.write(data)
+            checksum.update(data)
+        file.seek(PREFIX.size + len(header))
+        file.write(checksum.digest())
+    os.replace(temp_path, file_path)
+
+
+def read_snapshot(file_path: str, verify: bool = True) -> ColumnarCatalog:
+    with open(file_path, 'rb') as file:
+        magic, header_length = PREFIX.unpack(file.read(PREFIX.size))
+        if magic != MAGIC:
+            raise ValueError(f'{file_path} is not a catalog snapshot')
+        header_bytes = file.read(header_length)
+        header = json.loads(header_bytes)
+        digest = file.read(32)
+    data_start = align(PREFIX.size + header_length + 32)
+
+    buffer = np.memmap(file_path, dtype=np.uint8, mode='r')
+    data = buffer[data_start:]
+    if verify:
+        end = max(
+            (
+                entry['offset']
+                + entry['length'] * np.dtype(entry['dtype']).itemsize
+                for entries in header['layout'].values()
+                for entry in entries.values()
+            ),
+            default=0,
+        )
+        checksum = hashlib.sha256(header_bytes)
+        checksum.update(data[:end])
+        if checksum.digest() != digest:
+            raise ValueError(f'Checksum mismatch in snapshot {file_path}')
+
+    def view(entry: Dict[str, Any]) -> np.ndarray:
+        dtype = np.dtype(entry['dtype'])
+        start = entry['offset']
+        stop = start + entry['length'] * dtype.itemsize
+        return data[start:stop].view(dtype)
+
+    columns = {
+        name: view(entry) for name, entry in header['layout']['column'].items()
+    }
+    codes = {
+        name: view(entry) for name, entry in header['layout']['codes'].items()
+    }
+    return ColumnarCatalog(columns, header['categories'], codes)
@@ -0,0 +1,189 @@
+import hashlib
+import html
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from .app import ProductInfo
+
+PRICE_PATH = '/system/modrequest'
+
+
+def render_product(product: ProductInfo) -> str:
+    options = ''.join(
+        f'<option data-skuid="{html.escape(skuid)}">{length} Ft.</option>'
+        for length, skuid in product.length_skuids.items()
+    )
+    return (
+        f'<div class="product-row" '
+        f'data-product-id="{html.escape(product.product_id)}">'
+        f'<div class="product-size">{html.escape(product.size)}<br>'
+        f'<span>{html.escape(product.desc)}</span></div>'
+        f'<div class="product-base-weight">{product.base_weight} lb</div>'
+        f'<select class="length-select"><option>Select length</option>'
+        f'{options}</select></div>'
+    )
+
+
+def render_page(products: List[ProductInfo]) -> str:
+    rows = ''.join(render_product(product) for product in products)
+    return (
+        '<!DOCTYPE html><html><head><title>Catalog</title></head><body>'
+        f'<div class="product-table">{rows}</div></body></html>'
+    )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server: 'StubHTTPServer'
+
+    def setup(self) -> None:
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def respond(
+        self,
+        status: int,
+        body: bytes,
+        content_type: str,
+        etag: Optional[str] = None,
+    ) -> None:
+        with self.server.lock:
+            self.server.requests += 1
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        if etag is not None:
+            self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        page = self.server.pages.get(self.path)
+        if page is None:
+            self.respond(404, b'Not found', 'text/plain')
+            return
+        etag = '"%s"' % hashlib.sha1(page).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            self.respond(304, b'', 'text/html; charset=utf-8', etag)
+            return
+        self.respond(200, page, 'text/html; charset=utf-8', etag)
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get('Content-Length', 0))
+        form = parse_qs(self.rfile.read(length).decode('ascii'))
+        batch = form.get('request') == ['metals.getPrices']
+        if batch and not self.server.batch:
+            self.respond(400, b'Unknown request', 'text/plain')
+            return
+        sku_field = 'data[sku_id][]' if batch else 'data[sku_id]'
+        if self.path != PRICE_PATH or sku_field not in form:
+            self.respond(404, b'Not found', 'text/plain')
+            return
+        with self.server.lock:
+            self.server.price_requests += 1
+            failing = (
+                self.server.fail_every > 0
+                and self.server.price_requests % self.server.fail_every == 0
+            )
+        if failing:
+            self.respond(503, b'Service unavailable', 'text/plain')
+            return
+        if batch:
+            prices = {
+                skuid: f'{self.server.prices[skuid]:.2f}'
+                for skuid in form[sku_field]
+                if skuid in self.server.prices
+            }
+            self.respond(
+                200, json.dumps(prices).encode('ascii'), 'application/json'
+            )
+            return
+        price = self.server.prices.get(form['data[sku_id]'][0])
+        if price is None:
+            self.respond(404, b'Unknown SKU', 'text/plain')
+            return
+        self.respond(200, f'{price:.2f}'.encode('ascii'), 'text/plain')
+
+    def log_message(self, *_: Any) -> None:
+        pass
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address: Tuple[str, int],
+        pages: Dict[str, bytes],
+        prices: Dict[str, float],
+        fail_every: int = 0,
+        batch: bool = True,
+    ) -> None:
+        super().__init__(address, StubHandler)
+        self.batch = batch
+        self.pages = pages
+        self.prices = prices
+        self.fail_every = fail_every
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+        self.price_requests = 0
+
+
+class StubServer:
+    def __init__(
+        self,
+        catalog: Dict[Tuple[str, str], List[ProductInfo]],
+        prices: Dict[str, float],
+        host: str = '127.0.0.1',
+        port: int = 0,
+        fail_every: int = 0,
+        batch: bool = True,
+    ) -> None:
+        self.paths = {
+            key: '/' + '-'.join(key).lower().replace(' ', '-')
+            for key in catalog
+        }
+        pages = {
+            self.paths[key]: render_page(products).encode('utf-8')
+            for key, products in catalog.items()
+        }
+        self.httpd = StubHTTPServer(
+            (host, port), pages, prices, fail_every, batch
+        )
+        self.thread = threading.Thread(
+            target=self.httpd.serve_forever, daemon=True
+        )
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    @property
+    def urls(self) -> Dict[Tuple[str, str], str]:
+        return {key: self.base_url + path for key, path in self.paths.items()}
+
+    @property
+    def price_url(self) -> str:
+        return self.base_url + PRICE_PATH
+
+    def start(self) -> 'StubServer':
+        self.thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.thread.join()
+
+    def __enter__(self) -> 'StubServer':
+        return self.start()
+
+    def __exit__(self, *_: Any) -> None:
+        self.stop()
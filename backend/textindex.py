@@ -0,0 +1,154 @@
+import bisect
+import functools
+import math
+import re
+from typing import Dict, List, Sequence, Set, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(
+    r'(\d+)-(\d+)/(\d+)|(\d+)/(\d+)|(\d*\.\d+|\d+)|([a-z][a-z0-9]*)'
+)
+NUMBER = (
+    r'(?<![\w.\-/#])(\d+-\d+/\d+|\d+/\d+|\d*\.\d+|\d+)(?![\w\-/])'
+    r'\s*(["\u201d]?)'
+)
+OD_RE = re.compile(NUMBER + r'\s*(?:od|dia|diameter)\b', re.IGNORECASE)
+WALL_RE = re.compile(NUMBER + r'\s*(?:wall|thick|thickness)\b', re.IGNORECASE)
+DIMENSION_RE = re.compile(NUMBER)
+EXCLUDED_RE = re.compile(
+    r'#?\d+\s*(?:ga|gauge)\b'
+    r'|\b(?:w|s|m|hp|c|mc|wt)\d+(?:\.\d+)?\s*x\s*\d+(?:\.\d+)?',
+    re.IGNORECASE,
+)
+ROUND_SHAPES = frozenset({'Round Bar', 'Round Tube', 'Pipe'})
+STOP_WORDS = frozenset({'x'})
+DIMENSION_COLUMNS = ('thickness', 'width', 'od')
+
+Dimensions = Tuple[float, float, float]
+
+
+def number(text: str) -> float:
+    whole, _, fraction = text.rpartition('-')
+    if '/' in fraction:
+        numerator, denominator = fraction.split('/')
+        value = int(numerator) / int(denominator)
+        return value + (int(whole) if whole else 0)
+    return float(text)
+
+
+def format_number(value: float) -> str:
+    return '%g' % round(value, 6)
+
+
+@functools.lru_cache(maxsize=65536)
+def tokenize(text: str) -> Tuple[str, ...]:
+    tokens = []
+    for match in TOKEN_RE.finditer(text.lower()):
+        whole, numerator, denominator, top, bottom, decimal, word = (
+            match.groups()
+        )
+        if word is not None:
+            if word not in STOP_WORDS:
+                tokens.append(word)
+        elif decimal is not None:
+            tokens.append(format_number(float(decimal)))
+        elif top is not None:
+            tokens.append(format_number(int(top) / int(bottom)))
+        else:
+            tokens.append(
+                format_number(int(whole) + int(numerator) / int(denominator))
+            )
+    return tuple(tokens)
+
+
+def is_prefix(token: str) -> bool:
+    return token[0].isalpha()
+
+
+def is_dimension(match: 're.Match[str]') -> bool:
+    value = match.group(1)
+    return bool(match.group(2)) or '/' in value or '.' in value
+
+
+@functools.lru_cache(maxsize=65536)
+def dimensions(shape: str, size: str, desc: str) -> Dimensions:
+    od = wall = math.nan
+    for text in (size, desc):
+        od_match = OD_RE.search(text)
+        if od_match is not None and math.isnan(od):
+            od = number(od_match.group(1))
+        wall_match = WALL_RE.search(text)
+        if wall_match is not None and math.isnan(wall):
+            wall = number(wall_match.group(1))
+    excluded = [match.span() for match in EXCLUDED_RE.finditer(size)]
+    tagged = {
+        match.start(1)
+        for pattern in (OD_RE, WALL_RE)
+        for match in pattern.finditer(size)
+    }
+    values = [
+        number(match.group(1))
+        for match in DIMENSION_RE.finditer(size)
+        if match.start(1) not in tagged
+        and is_dimension(match)
+        and not any(start <= match.start(1) < end for start, end in excluded)
+    ]
+    width = max(values, default=math.nan)
+    if shape in ROUND_SHAPES:
+        if math.isnan(od):
+            od = width
+        width = math.nan
+    if math.isnan(wall) and len(values) >= 2:
+        wall = min(values)
+    return wall, width, od
+
+
+def text_match(query: str, *texts: str) -> bool:
+    tokens: Set[str] = set()
+    for text in texts:
+        tokens.update(tokenize(text))
+    return all(
+        (
+            any(candidate.startswith(token) for candidate in tokens)
+            if is_prefix(token)
+            else token in tokens
+        )
+        for token in tokenize(query)
+    )
+
+
+class TextIndex:
+    def __init__(self, fields: Dict[str, Sequence[str]]) -> None:
+        postings: Dict[str, Dict[str, List[int]]] = {}
+        for column, values in fields.items():
+            for code, value in enumerate(values):
+                for token in set(tokenize(value)):
+                    postings.setdefault(token, {}).setdefault(
+                        column, []
+                    ).append(code)
+        self.postings = {
+            token: {
+                column: np.array(codes, dtype=np.int32)
+                for column, codes in columns.items()
+            }
+            for token, columns in postings.items()
+        }
+        self.vocabulary = sorted(self.postings)
+
+    def expand(self, token: str) -> List[str]:
+        if not is_prefix(token):
+            return [token] if token in self.postings else []
+        start = bisect.bisect_left(self.vocabulary, token)
+        stop = bisect.bisect_left(self.vocabulary, token + '\uffff')
+        return self.vocabulary[start:stop]
+
+    def lookup(self, token: str) -> Dict[str, np.ndarray]:
+        matches: Dict[str, List[np.ndarray]] = {}
+        for candidate in self.expand(token):
+            for column, codes in self.postings[candidate].items():
+                matches.setdefault(column, []).append(codes)
+        return {
+            column: np.unique(np.concatenate(codes))
+            for column, codes in matches.items()
+        }
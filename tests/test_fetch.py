@@ -0,0 +1,140 @@
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pytest
+
+from backend import app
+from backend.app import ProductInfo, load_all, product_uuid, save_all
+from backend.fetch import RetryPolicy
+from backend.stub import StubServer
+
+CATALOG: Dict[Tuple[str, str], List[ProductInfo]] = {
+    ('Steel', 'Angle'): [
+        ProductInfo(
+            product_uuid('7107'),
+            '7107',
+            1,
+            '1/2" x 1/2"',
+            '1/8" wall',
+            {'2': '24406', '4': '24407', '8': '24408'},
+            0.38,
+        ),
+        ProductInfo(
+            product_uuid('7108'),
+            '7108',
+            2,
+            '3/4" x 3/4"',
+            '1/8" wall',
+            {'2': '24410', '10': '24411'},
+            0.59,
+        ),
+    ],
+    ('Aluminum 6061', 'Flat Bar'): [
+        ProductInfo(
+            product_uuid('8201'),
+            '8201',
+            1,
+            '1/8" x 1"',
+            '6061-T6511',
+            {'4': '31001', '12': '31002', '20': '31003'},
+            0.15,
+        ),
+    ],
+}
+PRICES = {
+    '24406': 5.12,
+    '24407': 9.87,
+    '24408': 18.4,
+    '24410': 7.25,
+    '24411': 31.5,
+    '31001': 4.1,
+    '31002': 11.95,
+    '31003': 19.6,
+}
+PRODUCTS = sum(len(products) for products in CATALOG.values())
+
+
+@pytest.fixture(autouse=True)
+def batch_unsupported(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(app, 'BATCH_UNSUPPORTED', set())
+
+
+def scrape(
+    stub: StubServer, path: str, batch: bool, attempts: int = 4
+) -> None:
+    save_all(
+        stub.urls,
+        path,
+        concurrency=2,
+        price_url=stub.price_url,
+        rate=None,
+        retry=RetryPolicy(attempts=attempts, base_delay=0.0),
+        batch=batch,
+    )
+
+
+def saved_prices(path: str) -> Dict[str, float]:
+    return {
+        product.length_skuids[str(variation.length)]: variation.price
+        for products, variations in load_all(path).values()
+        for product in products
+        for variation in variations
+        if variation.parent_uuid == product.uuid
+    }
+
+
+def failures(path: str) -> List[dict]:
+    found: List[dict] = []
+    for file_name in sorted(os.listdir(path)):
+        if file_name.endswith('.failures.json'):
+            with open(os.path.join(path, file_name)) as file:
+                found.extend(json.load(file))
+    return found
+
+
+def test_batch_prices_use_one_request_per_product(tmp_path: Path) -> None:
+    with StubServer(CATALOG, PRICES, batch=True) as stub:
+        scrape(stub, str(tmp_path), batch=True)
+        assert stub.httpd.price_requests == PRODUCTS
+    assert saved_prices(str(tmp_path)) == PRICES
+    assert failures(str(tmp_path)) == []
+
+
+def test_batch_prices_fall_back_to_single_requests(tmp_path: Path) -> None:
+    with StubServer(CATALOG, PRICES, batch=False) as stub:
+        scrape(stub, str(tmp_path), batch=True)
+        assert stub.httpd.price_requests == len(PRICES)
+    assert saved_prices(str(tmp_path)) == PRICES
+    assert failures(str(tmp_path)) == []
+
+
+def test_single_requests_without_batch(tmp_path: Path) -> None:
+    with StubServer(CATALOG, PRICES, batch=True) as stub:
+        scrape(stub, str(tmp_path), batch=False)
+        assert stub.httpd.price_requests == len(PRICES)
+    assert saved_prices(str(tmp_path)) == PRICES
+
+
+def test_failed_requests_are_retried(tmp_path: Path) -> None:
+    with StubServer(CATALOG, PRICES, fail_every=3, batch=False) as stub:
+        scrape(stub, str(tmp_path), batch=False)
+        requests = stub.httpd.price_requests
+    assert requests > len(PRICES)
+    assert requests - requests // 3 == len(PRICES)
+    assert saved_prices(str(tmp_path)) == PRICES
+    assert failures(str(tmp_path)) == []
+
+
+def test_exhausted_retries_are_recorded(tmp_path: Path) -> None:
+    with StubServer(CATALOG, PRICES, fail_every=2, batch=False) as stub:
+        scrape(stub, str(tmp_path), batch=False, attempts=1)
+        assert stub.httpd.price_requests == len(PRICES)
+    saved = saved_prices(str(tmp_path))
+    failed = failures(str(tmp_path))
+    assert len(failed) == len(PRICES) // 2
+    assert {failure['skuid'] for failure in failed} == set(PRICES) - set(saved)
+    assert all('503' in failure['error'] for failure in failed)
+    assert not any(failure['stale'] for failure in failed)
+    assert all(PRICES[skuid] == price for skuid, price in saved.items())
@@ -0,0 +1,71 @@
+import glob
+import os
+
+import pytest
+
+from backend.app import parse_products
+from backend.parse import available_parsers
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+PAGES = sorted(glob.glob(os.path.join(FIXTURES, '*.html')))
+
+
+def read(path: str) -> bytes:
+    with open(path, 'rb') as file:
+        return file.read()
+
+
+@pytest.mark.parametrize('parser', available_parsers())
+@pytest.mark.parametrize('path', PAGES, ids=os.path.basename)
+def test_parser_matches_html5lib(path: str, parser: str) -> None:
+    content = read(path)
+    expected = list(parse_products(content, 'html5lib'))
+    assert expected
+    assert list(parse_products(content, parser)) == expected
+
+
+@pytest.mark.parametrize('parser', available_parsers())
+@pytest.mark.parametrize('path', PAGES, ids=os.path.basename)
+def test_parser_matches_html5lib_in_chunks(path: str, parser: str) -> None:
+    content = read(path)
+    chunks = [
+        content[start : start + 7] for start in range(0, len(content), 7)
+    ]
+    expected = list(parse_products(content, 'html5lib'))
+    assert list(parse_products(chunks, parser)) == expected
+
+
+def test_steel_angle_products() -> None:
+    products = list(
+        parse_products(read(os.path.join(FIXTURES, 'steel-angle.html')))
+    )
+    assert [product.product_id for product in products] == [
+        '7107',
+        '7108',
+        '7109',
+        '7110',
+        '7111',
+        '7112',
+        '7113',
+        '7114',
+    ]
+    first = products[0]
+    assert (first.size, first.desc, first.base_weight) == (
+        '1/2" x 1/2"',
+        '1/8" wall',
+        0.38,
+    )
+    assert dict(first.length_skuids) == {
+        '2': '24406',
+        '4': '24407',
+        '8': '24408',
+        '20': '24409',
+    }
+    assert products[2].desc == '3/16" wall A36 & A529'
+    assert dict(products[3].length_skuids) == {}
+    assert dict(products[4].length_skuids) == {
+        '5': '24415',
+        '10': '24416',
+        '20': '24417',
+    }
+    assert dict(products[6].length_skuids) == {'4': '24420', '8': '24421'}
@@ -0,0 +1,31 @@
+import math
+from typing import Tuple
+
+import pytest
+
+from backend.textindex import dimensions
+
+NAN = math.nan
+
+
+@pytest.mark.parametrize(
+    'shape, size, desc, expected',
+    [
+        ('Angle', '1/2" x 1/2"', '1/8" wall', (0.125, 0.5, NAN)),
+        ('Angle', '3/4” x 3/4”', '1/8” wall', (0.125, 0.75, NAN)),
+        ('Flat Bar', '1/8" x 1"', '', (0.125, 1.0, NAN)),
+        ('Flat Bar', '#10 ga', '', (NAN, NAN, NAN)),
+        ('Flat Bar', '16 ga (.060") x 48"', '', (0.06, 48.0, NAN)),
+        ('Beam', 'W8 x 10', '', (NAN, NAN, NAN)),
+        ('Channel', 'C3 x 4.1', '1/4" web', (NAN, NAN, NAN)),
+        ('Round Bar', '1-1/2"', '', (NAN, NAN, 1.5)),
+        ('Round Tube', '2" x 1/8"', '1/8" wall', (0.125, NAN, 2.0)),
+        ('Round Tube', '1" OD x .065" wall', '', (0.065, NAN, 1.0)),
+    ],
+)
+def test_dimensions(
+    shape: str, size: str, desc: str, expected: Tuple[float, ...]
+) -> None:
+    assert dimensions(shape, size, desc) == pytest.approx(
+        expected, nan_ok=True
+    )